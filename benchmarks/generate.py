@@ -0,0 +1,113 @@
+"""Generates a synthetic Terraform monorepo for the benchmarks.
+
+Modules are spread over a directory tree ``depth`` levels deep.  Every module
+has a ``main.tf`` with its resources, data resources and calls to sibling
+modules, a ``variables.tf`` and an ``outputs.tf``.  ``comment_density`` is the
+fraction of objects that get a docstring.
+"""
+
+import argparse
+import os
+import random
+
+
+def _comment(rng: random.Random, density: float, what: str) -> str:
+    if rng.random() >= density:
+        return ""
+    lines = [f"# {what}"]
+    for idx in range(rng.randint(0, 4)):
+        lines.append(f"# line {idx} describing {what} in some detail.")
+    return "\n".join(lines) + "\n"
+
+
+def module_paths(modules: int, depth: int) -> list[str]:
+    paths = []
+    for idx in range(modules):
+        parts = [f"group{(idx >> (3 * level)) % 8}" for level in range(depth - 1)]
+        paths.append("/".join(parts + [f"module{idx}"]))
+    return paths
+
+
+def generate(
+    root: str,
+    modules: int = 100,
+    variables: int = 10,
+    resources: int = 10,
+    depth: int = 2,
+    comment_density: float = 0.8,
+    calls: int = 2,
+    seed: int = 0,
+) -> list[str]:
+    """Writes the synthetic tree below ``root`` and returns the module paths."""
+    rng = random.Random(seed)
+    paths = module_paths(modules, max(depth, 1))
+    for idx, path in enumerate(paths):
+        module_dir = os.path.join(root, path)
+        os.makedirs(module_dir, exist_ok=True)
+
+        main = [
+            f"# Module {path}\n#\n# A synthetic module used by the benchmarks.\n",
+            "terraform {\n  required_providers {\n"
+            '    aws = {\n      source  = "hashicorp/aws"\n'
+            '      version = ">= 4.0"\n    }\n  }\n}\n',
+        ]
+        for r in range(resources):
+            kind = "data" if r % 5 == 4 else "resource"
+            main.append(
+                _comment(rng, comment_density, f"{kind} {r}")
+                + f'{kind} "aws_s3_bucket" "r{r}" {{\n'
+                + f'  bucket = "bucket-{idx}-{r}"\n'
+                + "  tags = {\n    Name = var.v0\n  }\n}\n"
+            )
+        for c in range(min(calls, len(paths) - 1)):
+            target = paths[(idx + c + 1) % len(paths)]
+            source = os.path.relpath(os.path.join(root, target), module_dir)
+            main.append(
+                _comment(rng, comment_density, f"call {c}")
+                + f'module "call{c}" {{\n  source = "{source}"\n}}\n'
+            )
+        with open(os.path.join(module_dir, "main.tf"), "w") as f:
+            f.write("\n".join(main))
+
+        with open(os.path.join(module_dir, "variables.tf"), "w") as f:
+            for v in range(variables):
+                default = f'  default = "value-{v}"\n' if v % 2 else ""
+                f.write(
+                    _comment(rng, comment_density, f"variable {v}")
+                    + f'variable "v{v}" {{\n  type = string\n{default}}}\n\n'
+                )
+
+        with open(os.path.join(module_dir, "outputs.tf"), "w") as f:
+            for r in range(0, resources, 2):
+                f.write(
+                    _comment(rng, comment_density, f"output {r}")
+                    + f'output "o{r}" {{\n  value = "o{r}"\n}}\n\n'
+                )
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--modules", type=int, default=100)
+    parser.add_argument("--variables", type=int, default=10)
+    parser.add_argument("--resources", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--comment-density", type=float, default=0.8)
+    parser.add_argument("--calls", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(
+        args.root,
+        modules=args.modules,
+        variables=args.variables,
+        resources=args.resources,
+        depth=args.depth,
+        comment_density=args.comment_density,
+        calls=args.calls,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
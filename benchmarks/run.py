@@ -0,0 +1,262 @@
+"""Measures how sphinx-tfdoc scales with the size of a Terraform repository.
+
+For every size, a synthetic repository is generated (see ``generate.py``) and
+the following phases are timed, and their peak traced memory is measured in a
+second run, so that tracemalloc does not slow down the timed one:
+
+``load``
+    discovery and inspection (``TerraformStore.load``)
+``docstrings``
+    docstring extraction for every module and object
+``render``
+    rendering the RST pages (``Renderer.render``)
+``resolve``
+    resolving a reference to every object through
+    ``TerraformDomain.resolve_xref``, plus a few misses, which are reported
+    with their candidates by ``TerraformDomain.warn_unresolved``
+
+The inspect backend uses the offline stub in ``benchmarks/bin``, so no
+terraform-config-inspect binary is needed.  With ``--check``, the run fails
+when a phase is slower (or uses more memory) than the stored baseline by more
+than the given tolerance.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from docutils import nodes  # noqa: E402
+from generate import generate  # noqa: E402
+from sphinx.addnodes import pending_xref  # noqa: E402
+from sphinx.application import Sphinx  # noqa: E402
+from sphinx_tfdoc.render import Renderer  # noqa: E402
+from sphinx_tfdoc.store import TerraformStore  # noqa: E402
+from sphinx_tfdoc.terraform import TerraformDomain  # noqa: E402
+
+
+BASELINE = os.path.join(HERE, "baseline.json")
+SIZES = [10, 100, 1000, 10000]
+
+# xref role of every object kind
+ROLES = {
+    "data_resource": "data",
+    "managed_resource": "resource",
+    "module_call": "called_module",
+    "output": "output",
+    "required_provider": "required_provider",
+    "variable": "variable",
+}
+
+
+def make_config(backend: str) -> SimpleNamespace:
+    # the subset of the Sphinx config the store and renderer read
+    return SimpleNamespace(
+        tfdoc_backend=backend,
+        tfdoc_module_docstring_files=["main.tf"],
+        tfdoc_docstring_ignores=[],
+        tfdoc_exclude_patterns=[],
+        tfdoc_source_cache_size=256,
+        tfdoc_automodule=False,
+        tfdoc_index_fanout=50,
+        tfdoc_split_threshold=500,
+        tfdoc_split_chunk_size=200,
+        tfdoc_inspect_timeout=0,
+        tfdoc_skip_failures=False,
+        tfdoc_lazy=False,
+    )
+
+
+class Phase:
+    """Times a phase, or traces its peak memory when ``trace`` is set.
+
+    tracemalloc slows down every allocation, so the time is taken in a run
+    without it, and the memory in a separate one.
+    """
+
+    def __init__(self, results: dict, name: str, trace: bool = False):
+        self.results = results
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self) -> "Phase":
+        if self.trace:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        result = self.results.setdefault(self.name, {})
+        if self.trace:
+            _, result["peak_bytes"] = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            result["seconds"] = round(elapsed, 4)
+
+
+def run_size(size: int, args: argparse.Namespace) -> dict:
+    results: dict = {}
+    with tempfile.TemporaryDirectory(prefix="tfdoc-bench-") as tmp:
+        root = os.path.join(tmp, "tf")
+        generate(
+            root,
+            modules=size,
+            variables=args.variables,
+            resources=args.resources,
+            depth=args.depth,
+            comment_density=args.comment_density,
+        )
+        for trace in (False, True):
+            run_phases(root, os.path.join(tmp, f"run-{trace}"), results, args, trace)
+    return results
+
+
+def run_phases(
+    root: str, tmp: str, results: dict, args: argparse.Namespace, trace: bool
+) -> None:
+    config = make_config(args.backend)
+
+    with Phase(results, "load", trace):
+        store = TerraformStore(config)
+        store.load([root], jobs=args.jobs)
+
+    with Phase(results, "docstrings", trace):
+        for module in store.modules.values():
+            module.docstring
+            for child in module.children:
+                child.docstring
+
+    with Phase(results, "render", trace):
+        renderer = Renderer(config, [], os.path.join(tmp, "docs"))
+        renderer.render(store, jobs=args.jobs)
+
+    # the objects the directives would note while reading a document
+    app, domain = make_domain(tmp)
+    app.env.temp_data["docname"] = "doc"
+    targets = []
+    for module in store.modules.values():
+        objects = [("module", module.name, module.name)]
+        for child in module.children:
+            role = ROLES[type(child).kind]
+            objects.append((role, child.name, f"{module.name}.{child.name}"))
+        for role, name, target in objects:
+            key = f"{module.name}.{role}.{name}"
+            domain.note_object(key, role, key, module=module.name, objname=name)
+            targets.append((role, target))
+    app.env.temp_data.clear()
+    step = max(len(targets) // 100, 1)
+    targets += [(role, target + "x") for role, target in targets[::step]]
+    # the reference nodes are built up front, as the reader would
+    refs = [
+        (
+            pending_xref("", refdomain="tf", reftype=role, reftarget=target),
+            nodes.literal(target, target),
+        )
+        for role, target in targets
+    ]
+
+    with Phase(results, "resolve", trace):
+        for node, contnode in refs:
+            role, target = node["reftype"], node["reftarget"]
+            found = domain.resolve_xref(
+                app.env, "index", app.builder, role, target, node, contnode
+            )
+            if found is None:
+                domain.warn_unresolved(node)
+
+
+def make_domain(tmp: str) -> tuple[Sphinx, TerraformDomain]:
+    # an empty project without tfdoc_dirs only sets up the domain; the
+    # warnings about the misses are discarded
+    srcdir = os.path.join(tmp, "sphinx")
+    os.makedirs(srcdir)
+    app = Sphinx(
+        srcdir,
+        None,
+        os.path.join(srcdir, "_build"),
+        os.path.join(srcdir, "_doctrees"),
+        "dummy",
+        confoverrides={"extensions": ["sphinx_tfdoc"]},
+        status=None,
+        warning=io.StringIO(),
+        freshenv=True,
+    )
+    return app, app.env.get_domain("tf")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    failures = []
+    for size, phases in current.items():
+        for phase, result in phases.items():
+            base = baseline.get(size, {}).get(phase)
+            if base is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                limit = base[metric] * (1 + tolerance)
+                if result[metric] > limit:
+                    failures.append(
+                        f"{size} modules, {phase}: {metric} {result[metric]} "
+                        f"exceeds baseline {base[metric]} (+{tolerance:.0%})"
+                    )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backend", choices=["inspect", "native"], default="inspect")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--variables", type=int, default=10)
+    parser.add_argument("--resources", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--comment-density", type=float, default=0.8)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--update", action="store_true", help="store as baseline")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    os.environ["PATH"] = os.pathsep.join(
+        [os.path.join(HERE, "bin"), os.environ.get("PATH", "")]
+    )
+
+    current = {}
+    for size in args.sizes:
+        current[str(size)] = run_size(size, args)
+        for phase, result in current[str(size)].items():
+            print(
+                f"{size:>6} modules  {phase:<10} {result['seconds']:>9.3f}s "
+                f"{result['peak_bytes'] / 1024 / 1024:>9.1f} MiB"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+
+    if args.check:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        failures = compare(baseline, current, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import logging
+import sys
+
+from sphinx.errors import SphinxError
+from sphinx.util.console import nocolor
+
+from .shard import generate, merge
+from .watch import watch
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    # shards are numbered from 1 to n on the command line, from 0 internally
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got `{value}`") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"expected 1 <= i <= n, got `{value}`")
+    return index - 1, count
+
+
+def parse_override(value: str) -> tuple[str, str]:
+    name, sep, setting = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected name=value, got `{value}`")
+    return name, setting
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sphinx_tfdoc")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    watch_parser = commands.add_parser(
+        "watch",
+        help="rebuild the documentation whenever a file changes",
+        description="Builds the documentation, then rebuilds it whenever a "
+        "document or Terraform file changes, keeping the Terraform modules in "
+        "memory between builds.  Unknown options are passed to sphinx-build.",
+    )
+    watch_parser.add_argument("sourcedir")
+    watch_parser.add_argument("outputdir")
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="poll for changes instead of using inotify"
+    )
+
+    generate_parser = commands.add_parser(
+        "generate",
+        help="render the module pages without running Sphinx",
+        description="Inspects the Terraform modules configured in SOURCEDIR/conf.py "
+        "and renders their pages, optionally for a single shard.  The loaded "
+        "modules are written to FRAGMENT for `merge`.",
+    )
+    generate_parser.add_argument("sourcedir")
+    generate_parser.add_argument("fragment")
+    generate_parser.add_argument(
+        "--shard", type=parse_shard, help="only process shard i of n (e.g. 2/4)"
+    )
+
+    merge_parser = commands.add_parser(
+        "merge",
+        help="combine the fragments written by generate",
+        description="Combines the fragments of every shard into the store that "
+        "the extension reads from `tfdoc_store_file`, and renders the index.",
+    )
+    merge_parser.add_argument("sourcedir")
+    merge_parser.add_argument("fragments", nargs="+")
+    merge_parser.add_argument(
+        "--store", help="where to write the store (default: tfdoc_store_file)"
+    )
+
+    for subparser in (generate_parser, merge_parser):
+        subparser.add_argument("-j", "--jobs", type=int, default=1)
+        subparser.add_argument(
+            "-D",
+            dest="overrides",
+            type=parse_override,
+            action="append",
+            default=[],
+            metavar="setting=value",
+            help="override a setting in conf.py",
+        )
+
+    args, sphinx_args = parser.parse_known_args(argv)
+    if args.command == "watch":
+        return watch(args.sourcedir, args.outputdir, sphinx_args, poll=args.poll)
+    if sphinx_args:
+        parser.error(f"unrecognized arguments: {' '.join(sphinx_args)}")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not sys.stdout.isatty():
+        nocolor()
+    try:
+        if args.command == "generate":
+            generate(
+                args.sourcedir,
+                args.fragment,
+                shard=args.shard,
+                jobs=args.jobs,
+                overrides=dict(args.overrides),
+            )
+        elif args.command == "merge":
+            merge(
+                args.sourcedir,
+                args.fragments,
+                store_file=args.store,
+                jobs=args.jobs,
+                overrides=dict(args.overrides),
+            )
+    except SphinxError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
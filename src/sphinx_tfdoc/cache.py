@@ -0,0 +1,274 @@
+import copy
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from sphinx.util.logging import getLogger
+
+
+logger = getLogger(__name__)
+
+# bump whenever the layout of the cached entries changes
+CACHE_FORMAT = "1"
+
+TF_SUFFIXES = (".tf", ".tf.json")
+
+
+def _inspector_version(executable: str) -> str:
+    # terraform-config-inspect has no --version flag, so the binary itself is
+    # hashed; a new build of the inspector invalidates every entry
+    path = shutil.which(executable)
+    if path is None:
+        return executable
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tf_files(fullpath: str, extra: list[str] = ()) -> list[os.DirEntry]:
+    try:
+        with os.scandir(fullpath) as it:
+            entries = [
+                e
+                for e in it
+                if (e.name.endswith(TF_SUFFIXES) or e.name in extra) and e.is_file()
+            ]
+    except OSError:
+        return []
+    return sorted(entries, key=lambda e: e.name)
+
+
+def fingerprint(fullpath: str, extra: list[str] = ()) -> str:
+    """A cheap digest of the names, sizes and mtimes of the Terraform files in
+    a directory (plus any ``extra`` file names), used to tell whether a
+    directory changed since the previous build."""
+    digest = hashlib.sha256()
+    for entry in _tf_files(fullpath, extra):
+        st = entry.stat()
+        digest.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def content_digest(fullpath: str, extra: list[str] = ()) -> str:
+    """A digest of the names and contents of the Terraform files in a directory
+    (plus any ``extra`` file names), shared by identical copies of a module."""
+    return content_digests(fullpath, extra)[1]
+
+
+def content_digests(fullpath: str, extra: list[str] = ()) -> tuple[str, str]:
+    """Returns the :func:`content_digest` of a directory without and with the
+    ``extra`` file names, reading every file once."""
+    tf_digest = hashlib.sha256()
+    digest = hashlib.sha256()
+    for entry in _tf_files(fullpath, extra):
+        with open(entry.path, "rb") as f:
+            content = f.read()
+        header = f"{entry.name}\0{len(content)}\0".encode()
+        body = hashlib.sha256(content).digest()
+        digest.update(header)
+        digest.update(body)
+        if entry.name.endswith(TF_SUFFIXES):
+            tf_digest.update(header)
+            tf_digest.update(body)
+    return tf_digest.hexdigest(), digest.hexdigest()
+
+
+def _rebase(data, func: Callable[[str], str]) -> None:
+    # rewrites every pos.filename in an inspector result in place
+    if isinstance(data, dict):
+        pos = data.get("pos")
+        if isinstance(pos, dict) and "filename" in pos:
+            pos["filename"] = func(pos["filename"])
+        for value in data.values():
+            _rebase(value, func)
+    elif isinstance(data, list):
+        for value in data:
+            _rebase(value, func)
+
+
+class InspectCache:
+    """On-disk cache of terraform-config-inspect results.
+
+    Entries are keyed by a digest of the Terraform files in a directory and the
+    inspector binary (or the parser version, for the native backend), so a directory is only re-inspected when one of its files
+    changes.  Filenames are stored relative to the inspected directory, which
+    allows the cache to be shared between checkouts (e.g. persisted by CI).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int,
+        executable: str = "terraform-config-inspect",
+        version: str | None = None,
+    ):
+        self.path = path
+        self.max_size = max_size
+        # the results of the native backend depend on the parser rather than
+        # on the inspector, whose binary is then not hashed
+        if version is None:
+            version = _inspector_version(executable)
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, fullpath: str, content: str | None = None) -> str:
+        """The key of the entry for ``fullpath``; ``content`` is its
+        :func:`content_digest`, when the caller already computed it."""
+        if content is None:
+            content = content_digest(fullpath)
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_FORMAT}\0{self.version}\0".encode())
+        digest.update(content.encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str, fullpath: str) -> dict | None:
+        entry = self._entry(key)
+        try:
+            with open(entry, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # bump the mtime so that eviction drops the least recently used entries
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        _rebase(data, lambda x: os.path.join(fullpath, x))
+        return data
+
+    def put(self, key: str, fullpath: str, data: dict) -> None:
+        data = copy.deepcopy(data)
+        _rebase(data, lambda x: os.path.relpath(x, fullpath))
+        entry = self._entry(key)
+        tmp = f"{entry}.{os.getpid()}.{id(data)}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning(f"[tfdoc] could not write cache entry {entry}: {e}")
+
+    def prune(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total <= self.max_size:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_size:
+                break
+
+
+class SourceFile:
+    """The lines of a Terraform file, with its comment blocks precomputed.
+
+    ``comments`` maps the index of a line to the comment block that ends right
+    above it, and ``header`` is the first comment block of the file.  Lines for
+    which ``should_ignore`` is true neither contribute to nor end a block.
+    """
+
+    def __init__(self, lines: list[str], should_ignore: Callable[[str], bool]):
+        self.lines = lines
+        self.comments: dict[int, list[str]] = {}
+        self.header: list[str] = []
+
+        run: list[str] = []
+        for idx, line in enumerate(lines):
+            line = line.lstrip()
+            if should_ignore(line):
+                if run:
+                    self.comments[idx] = list(run)
+                continue
+            if line.startswith("#"):
+                run.append(line[1:].rstrip("\n"))
+                continue
+            if run:
+                self.comments[idx] = run
+                if not self.header:
+                    self.header = run
+                run = []
+        if run and not self.header:
+            self.header = run
+
+
+class SourceCache:
+    """A bounded LRU of :class:`SourceFile` objects, so that every file is read
+    at most once no matter how many objects it defines."""
+
+    def __init__(self, should_ignore: Callable[[str], bool], max_size: int = 256):
+        self.should_ignore = should_ignore
+        self.max_size = max_size
+        self.files: OrderedDict[str, SourceFile] = OrderedDict()
+        self.lock = threading.Lock()
+        self.files_read = 0
+        self.bytes_read = 0
+
+    def __getstate__(self) -> dict:
+        # the store is pickled with the environment; the cached lines are only
+        # useful for the build that read them
+        state = self.__dict__.copy()
+        state["files"] = OrderedDict()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get(self, filename: str) -> SourceFile:
+        with self.lock:
+            source = self.files.get(filename)
+            if source is not None:
+                self.files.move_to_end(filename)
+                return source
+
+        with open(filename, "r") as f:
+            lines = f.readlines()
+        source = SourceFile(lines, self.should_ignore)
+
+        with self.lock:
+            self.files_read += 1
+            self.bytes_read += sum(len(line) for line in lines)
+            self.files[filename] = source
+            while len(self.files) > max(self.max_size, 1):
+                self.files.popitem(last=False)
+        return source
+
+    def invalidate(self, directory: str) -> None:
+        """Drops the files of ``directory`` that are cached."""
+        with self.lock:
+            for filename in list(self.files):
+                if os.path.dirname(filename) == directory:
+                    del self.files[filename]
+
+    def comments(self, filename: str, line: int) -> list[str]:
+        """Returns the comment block ending right above ``line`` (0-based)."""
+        return self.get(filename).comments.get(line, [])
+
+    def header(self, filename: str) -> list[str]:
+        """Returns the first comment block of ``filename``."""
+        return self.get(filename).header
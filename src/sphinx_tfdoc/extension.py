@@ -1,95 +1,288 @@
+import json
 import os
-from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
+from typing import cast
+
 from sphinx.addnodes import toctree
 from sphinx.application import Sphinx
+from sphinx.config import Config
 from sphinx.errors import ExtensionError
 from sphinx.util.console import darkgreen, bold
 from sphinx.util.logging import getLogger
-from sphinx.util import status_iterator
-from tabulate import tabulate
 
+from . import vcs, watch
+from .cache import InspectCache
+from .hcl import PARSER_VERSION
+from .metrics import Metrics
+from .render import Renderer
 from .store import TerraformStore
 from .terraform import TerraformDomain
 
 
 logger = getLogger(__name__)
 
-
-def rst_tabulate(rows):
-    table = [rows]
-    return tabulate([rows], tablefmt="grid")
+# the settings of the extension: name, default and rebuild condition
+CONFIG_VALUES = [
+    ("tfdoc_dirs", [], "env"),
+    ("tfdoc_recursive", True, "env"),
+    ("tfdoc_exclude_patterns", [], "env"),
+    ("tfdoc_template_dir", None, "env"),
+    ("tfdoc_target", "tfdoc", "env"),
+    ("tfdoc_module_docstring_files", [], "env"),
+    ("tfdoc_docstring_ignores", [], "env"),
+    ("tfdoc_parallel_jobs", None, "env"),
+    ("tfdoc_source_cache_size", 256, ""),
+    ("tfdoc_backend", "inspect", "env"),
+    ("tfdoc_cache_dir", None, ""),
+    ("tfdoc_cache_size", 64 * 1024 * 1024, ""),
+    ("tfdoc_metrics_file", None, ""),
+    ("tfdoc_automodule", False, "env"),
+    ("tfdoc_store_file", None, "env"),
+    ("tfdoc_changed_since", None, ""),
+    ("tfdoc_index_fanout", 50, "env"),
+    ("tfdoc_split_threshold", 500, "env"),
+    ("tfdoc_split_chunk_size", 200, "env"),
+    ("tfdoc_inspect_timeout", 0, ""),
+    ("tfdoc_skip_failures", False, "env"),
+    ("tfdoc_lazy", False, "env"),
+]
 
 
-def custom_indent(s: str, width: int) -> str:
-    lines = s.splitlines()
-    lines = [" " * width + line if len(line) else line for line in lines]
-    return "\n".join(lines)
+def read_config(confdir: str, overrides: dict | None = None) -> Config:
+    """Reads the ``conf.py`` in ``confdir`` outside of a Sphinx build."""
+    config = Config.read(confdir, overrides)
+    for name, default, rebuild in CONFIG_VALUES:
+        config.add(name, default, rebuild, ())
+    config.init_values()
+    return config
 
 
-def tfdoc_init(app: Sphinx) -> None:
-    if not app.config.tfdoc_dirs:
+def prepare(
+    config: Config, srcdir: str, doctreedir: str | None = None
+) -> tuple[list[str], str | None, list[str], InspectCache | None]:
+    """Validates the settings and resolves the paths they hold against
+    ``srcdir``, returning the Terraform directories, the target directory,
+    the template paths and the inspector cache."""
+    if not config.tfdoc_dirs:
         raise ExtensionError("You must configure the `tfdoc_dirs` setting")
-    dirs = app.config.tfdoc_dirs
+    dirs = config.tfdoc_dirs
     if isinstance(dirs, str):
         dirs = [dirs]
     dirs = [
-        d if os.path.abspath(d) else os.path.normpath(os.path.join(app.srcdir, d))
+        d if os.path.abspath(d) else os.path.normpath(os.path.join(srcdir, d))
         for d in dirs
     ]
     for d in dirs:
         if not os.path.exists(d):
             raise ExtensionError(f"tfdoc dir `{d}` not found")
 
-    target_dir = os.path.normpath(os.path.join(app.srcdir, app.config.tfdoc_target))
-    os.makedirs(target_dir, exist_ok=True)
+    if config.tfdoc_backend not in ("inspect", "native"):
+        raise ExtensionError(
+            f"unknown tfdoc_backend `{config.tfdoc_backend}`, "
+            "expected `inspect` or `native`"
+        )
+
+    # with an empty target, no pages are generated and the modules are only
+    # documented where the tf: directives are written by hand
+    target_dir = None
+    if config.tfdoc_target:
+        target_dir = os.path.normpath(os.path.join(srcdir, config.tfdoc_target))
+        os.makedirs(target_dir, exist_ok=True)
 
     template_paths = []
-    template_dir = app.config.tfdoc_template_dir
+    template_dir = config.tfdoc_template_dir
     if template_dir:
         if not os.path.isdir(template_dir):
-            template_dir = os.path.join(app.srcdir, template_dir)
+            template_dir = os.path.join(srcdir, template_dir)
         template_paths.append(template_dir)
-    template_paths.append((Path(__file__).parent / "templates").absolute())
-
-    store = TerraformStore(app.config)
-    if store.load(dirs, recursive=app.config.tfdoc_recursive):
-        env = Environment(
-            loader=FileSystemLoader(template_paths),
-            trim_blocks=True,
-            lstrip_blocks=True,
-            keep_trailing_newline=True,
-        )
-        env.globals["tabulate"] = rst_tabulate
-        env.globals["config"] = app.config
-        env.globals["path_exists"] = os.path.exists
-        env.filters["indent"] = custom_indent
-        for key, module in status_iterator(
-            store.modules.items(),
-            bold("[tfdoc] Rendering Modules "),
-            "darkgreen",
-            len(store.modules),
-            stringify_func=(lambda x: x[0]),
-        ):
-            template = env.get_template(f"{module.template}.rst")
-            rendered = template.render(module=module)
-            module_path = os.path.join(target_dir, module.name)
-            os.makedirs(module_path, exist_ok=True)
-            with open(f"{module_path}/index.rst", "w") as f:
-                f.write(rendered)
-
-        with open(f"{target_dir}/index.rst", "w") as f:
-            template = env.get_template("index.rst")
-            rendered = template.render(
-                modules=sorted(store.modules.values(), key=lambda x: x.name)
+
+    cache = None
+    cache_dir = config.tfdoc_cache_dir
+    if cache_dir is None and doctreedir is not None:
+        cache_dir = os.path.join(doctreedir, "tfdoc-cache")
+    if config.tfdoc_cache_size and cache_dir is not None:
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(srcdir, cache_dir)
+        version = None
+        if config.tfdoc_backend == "native":
+            # the parsed data holds the comment blocks, without ignored lines
+            ignores = config.tfdoc_docstring_ignores
+            version = f"native\0{PARSER_VERSION}\0{ignores!r}"
+        cache = InspectCache(cache_dir, config.tfdoc_cache_size, version=version)
+
+    return dirs, target_dir, template_paths, cache
+
+
+def tfdoc_init(app: Sphinx) -> None:
+    if not app.config.tfdoc_dirs:
+        # e.g. a site that only references modules documented elsewhere,
+        # through intersphinx
+        logger.info(bold("[tfdoc] no tfdoc_dirs, ") + "only adding the tf domain")
+        return
+    dirs, target_dir, template_paths, cache = prepare(
+        app.config, app.srcdir, app.doctreedir
+    )
+
+    # the store of the previous build is pickled with the environment; modules
+    # whose directories did not change are taken from it as-is, unless it was
+    # loaded with other settings
+    previous = getattr(app.env, "tfdoc_store", None)
+    if not isinstance(previous, TerraformStore) or not previous.reusable(app.config):
+        previous = None
+
+    metrics = Metrics()
+    jobs = app.config.tfdoc_parallel_jobs or app.parallel or 1
+    store_file = app.config.tfdoc_store_file
+    if store_file:
+        store_file = os.path.join(app.srcdir, store_file)
+    # merged from shards by `python -m sphinx_tfdoc merge`, which also rendered
+    # the pages
+    merged_store = None
+    if store_file and os.path.exists(store_file):
+        merged_store = TerraformStore.read(store_file)
+        if not merged_store.reusable(app.config):
+            logger.warning(
+                f"[tfdoc] {store_file} was merged with other settings, "
+                "loading the modules instead"
             )
-            f.write(rendered)
+            merged_store = None
+    merged = merged_store is not None
+    changed_since = app.config.tfdoc_changed_since
+    # in watch mode the store stays in memory between builds, and only the
+    # directories the watcher reported are reloaded
+    session = watch.current()
+    # the store the changes are applied to, and the changed paths
+    baseline, changes = None, None
+    if merged:
+        baseline = merged_store
+    elif (
+        session is not None
+        and session.store is not None
+        and session.changes is not None
+        and session.dirs == dirs
+        and session.store.reusable(app.config)
+    ):
+        baseline, changes = session.store, session.changes
+    elif changed_since:
+        baseline = previous
+
+    if changed_since and baseline is not None and changes is None:
+        if baseline.dirs != dirs:
+            logger.warning(
+                "[tfdoc] the baseline store was loaded from other directories, "
+                "ignoring tfdoc_changed_since"
+            )
+        else:
+            try:
+                diff = vcs.changed_files(changed_since, dirs)
+            except ExtensionError as e:
+                logger.warning(f"[tfdoc] {e}, ignoring tfdoc_changed_since")
+            else:
+                logger.info(
+                    bold("[tfdoc] changed since ")
+                    + f"{changed_since}: {len(diff)} files"
+                )
+                # the baseline may be the store of an earlier preview, whose
+                # changes must be reloaded too in case they were reverted
+                changes = diff | baseline.patched
+                baseline.patched = diff
+
+    if changes is not None:
+        # every other module is taken from the baseline as-is
+        store = baseline
+        store.cache = cache
+        store.metrics = metrics
+        with metrics.phase("load"):
+            loaded = store.reload(changes, jobs=jobs)
+    elif merged:
+        store = baseline
+        store.cache = cache
+        store.metrics = metrics
+        store.compare(previous)
+        loaded = True
+    else:
+        store = TerraformStore(app.config, cache=cache, metrics=metrics)
+        with metrics.phase("load"):
+            loaded = store.load(
+                dirs, recursive=app.config.tfdoc_recursive, jobs=jobs, previous=previous
+            )
+    if session is not None:
+        session.store = store
+        session.dirs = dirs
+        session.target_dir = target_dir
+        session.changes = set()
+    # tf:automodule renders the docstrings of the objects it documents with
+    # the same templates as the generated pages
+    renderer = Renderer(app.config, template_paths, target_dir, metrics=metrics)
+    renderer.bind(store)
+    app.tfdoc_renderer = renderer
+    if loaded and previous is not None:
+        logger.info(
+            bold("[tfdoc] modules: ")
+            + f"{len(store.added)} added, {len(store.changed)} changed, "
+            + f"{len(store.removed)} removed"
+        )
+    if loaded and target_dir is not None:
+        with metrics.phase("render"):
+            # pages merged along with a store file only need rendering when
+            # they are missing or the templates changed
+            outdated = set() if merged and changes is None else store.outdated
+            renderer.render(store, jobs=jobs, outdated=outdated)
 
     app.env.tfdoc_store = store
 
 
+def env_get_outdated(
+    app: Sphinx, env, added: set[str], changed: set[str], removed: set[str]
+) -> list[str]:
+    # documents that describe modules whose pages are outdated (the modules
+    # that were reloaded or went away, and their callers and callees) must be
+    # read again, even if their own source did not change
+    store = getattr(env, "tfdoc_store", None)
+    if store is None:
+        return []
+    domain = cast(TerraformDomain, env.get_domain("tf"))
+    docnames = set()
+    for name in store.outdated:
+        docnames.update(domain.modules.get(name, ()))
+    return sorted(docnames - removed)
+
+
+def env_merge_info(app: Sphinx, env, docnames: list[str], other) -> None:
+    # the modules a parallel reader loaded lazily are only in its copy of the
+    # store, which is discarded once its domain data is merged
+    store = getattr(env, "tfdoc_store", None)
+    other_store = getattr(other, "tfdoc_store", None)
+    if store is not None and other_store is not None and store.lazy:
+        store.adopt(other_store)
+
+
+def build_finished(app: Sphinx, exception: Exception | None) -> None:
+    store = getattr(app.env, "tfdoc_store", None)
+    if exception is not None or store is None:
+        return
+    metrics = store.metrics
+    logger.info(bold("[tfdoc] metrics: ") + metrics.summary())
+
+    report = metrics.report()
+    if app.config.tfdoc_metrics_file:
+        path = os.path.join(app.outdir, app.config.tfdoc_metrics_file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    app.emit("tfdoc-metrics", report)
+
+
+def warn_missing_reference(app: Sphinx, domain, node) -> bool | None:
+    # only emitted for the references that neither the domain nor a handler
+    # of missing-reference (e.g. intersphinx) could resolve
+    if domain is None or domain.name != "tf":
+        return None
+    cast(TerraformDomain, domain).warn_unresolved(node)
+    return True
+
+
 def doctree_read(app: Sphinx, doctree) -> None:
-    if app.env.docname == "index":
+    if app.env.docname == "index" and app.config.tfdoc_dirs and app.config.tfdoc_target:
         nodes = list(doctree.traverse(toctree))
         if not nodes:
             return
@@ -104,20 +297,23 @@ def doctree_read(app: Sphinx, doctree) -> None:
 def setup(app: Sphinx) -> dict:
     app.setup_extension("sphinx.ext.napoleon")
     app.connect("builder-inited", tfdoc_init)
+    app.connect("env-get-outdated", env_get_outdated)
+    app.connect("env-merge-info", env_merge_info)
     app.connect("doctree-read", doctree_read)
+    app.connect("build-finished", build_finished)
+    app.connect("warn-missing-reference", warn_missing_reference)
+    # emitted once per build with the metrics report, see `Metrics.report`
+    app.add_event("tfdoc-metrics")
     logger.info(bold("[tfoc] adding domain ") + darkgreen("TerraformDomain"))
-    app.add_config_value("tfdoc_dirs", [], "env")
-    app.add_config_value("tfdoc_recursive", True, "env")
-    app.add_config_value("tfdoc_template_dir", None, "env")
-    app.add_config_value("tfdoc_target", "tfdoc", "env")
-    app.add_config_value("tfdoc_module_docstring_files", [], "env")
-    app.add_config_value("tfdoc_docstring_ignores", [], "env")
+    for name, default, rebuild in CONFIG_VALUES:
+        app.add_config_value(name, default, rebuild)
     #app.add_config_value("tfdoc_auto_common_doc", True, "env")
     #app.add_config_value("tfdoc_common_doc_dir", [], "env")
     app.add_domain(TerraformDomain)
 
     return {
         "version": "0.1.0",
+        "env_version": 4,
         "parallel_read_safe": True,
         "parallel_write_safe": True,
     }
@@ -0,0 +1,611 @@
+"""A small, pure-Python reader for Terraform configuration files.
+
+Only the structure of a configuration is parsed: blocks, their labels and
+their attributes.  Attribute values are kept as token slices and are only
+evaluated when they are plain literals, which is all that documentation needs.
+The output of :func:`load_module` mirrors the JSON produced by
+``terraform-config-inspect --json``.
+"""
+
+import bisect
+import json
+import os
+import re
+from typing import Any, Callable, NamedTuple
+
+
+# bump whenever the output of load_module changes, which invalidates the
+# results of the native backend in the inspector cache
+PARSER_VERSION = "1"
+
+
+class HCLError(Exception):
+    def __init__(self, message: str, line: int):
+        super().__init__(f"line {line}: {message}")
+        self.message = message
+        self.line = line
+
+
+class Token(NamedTuple):
+    # one of: ident, number, string, template, heredoc, punct, newline, eof
+    type: str
+    value: Any
+    line: int
+    start: int
+    end: int
+
+
+class Attribute(NamedTuple):
+    name: str
+    tokens: list[Token]
+    line: int
+    raw: str
+
+
+class Block(NamedTuple):
+    type: str
+    labels: list[str]
+    body: list["Attribute | Block"]
+    line: int
+
+
+_PUNCT = sorted(
+    [
+        "...", "==", "!=", "<=", ">=", "&&", "||", "=>",
+        "{", "}", "[", "]", "(", ")", "=", ",", ".", ":", "?", "!",
+        "+", "-", "*", "/", "%", "<", ">",
+    ],
+    key=len,
+    reverse=True,
+)
+_IDENT_RE = re.compile(r"[^\W\d][\w-]*")
+_NUMBER_RE = re.compile(r"\d+(\.\d+)?([eE][+-]?\d+)?")
+_HEREDOC_RE = re.compile(r"<<(-?)([A-Za-z_][\w-]*)[ \t]*\r?\n")
+_ESCAPE_RE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+
+
+def _unescape(s: str) -> str:
+    def replace(m: re.Match) -> str:
+        esc = m.group(1)
+        if esc[0] in "uU":
+            return chr(int(esc[1:], 16))
+        return _ESCAPES.get(esc, m.group(0))
+
+    s = s.replace("$${", "${").replace("%%{", "%{")
+    return _ESCAPE_RE.sub(replace, s)
+
+
+def _has_template(s: str) -> bool:
+    return bool(re.search(r"(?<![$%])[$%]\{", s))
+
+
+class _Lexer:
+    def __init__(self, text: str):
+        self.text = text
+        self.line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+
+    def line(self, pos: int) -> int:
+        return bisect.bisect_right(self.line_starts, pos)
+
+    def token(self, type: str, value: Any, start: int, end: int) -> Token:
+        return Token(type, value, self.line(start), start, end)
+
+    def tokens(self) -> list[Token]:
+        text = self.text
+        n = len(text)
+        i = 0
+        result = []
+        while i < n:
+            c = text[i]
+            if c == "\n":
+                result.append(self.token("newline", None, i, i + 1))
+                i += 1
+            elif c in " \t\r\ufeff":
+                i += 1
+            elif c == "#" or text.startswith("//", i):
+                j = text.find("\n", i)
+                i = n if j < 0 else j
+            elif text.startswith("/*", i):
+                j = text.find("*/", i + 2)
+                i = n if j < 0 else j + 2
+            elif c == '"':
+                j, template = self._string(i)
+                raw = text[i + 1 : j - 1]
+                if template:
+                    result.append(self.token("template", raw, i, j))
+                else:
+                    result.append(self.token("string", _unescape(raw), i, j))
+                i = j
+            elif c == "<" and _HEREDOC_RE.match(text, i):
+                i = self._heredoc(i, result)
+            elif "0" <= c <= "9":
+                m = _NUMBER_RE.match(text, i)
+                value = m.group(0)
+                value = float(value) if m.group(1) or m.group(2) else int(value)
+                result.append(self.token("number", value, i, m.end()))
+                i = m.end()
+            elif m := _IDENT_RE.match(text, i):
+                result.append(self.token("ident", m.group(0), i, m.end()))
+                i = m.end()
+            else:
+                for p in _PUNCT:
+                    if text.startswith(p, i):
+                        break
+                else:
+                    p = c
+                result.append(self.token("punct", p, i, i + len(p)))
+                i += len(p)
+        result.append(self.token("eof", None, n, n))
+        return result
+
+    def _string(self, i: int) -> tuple[int, bool]:
+        # returns the index just past the closing quote, and whether the
+        # string contains template sequences
+        text = self.text
+        n = len(text)
+        j = i + 1
+        template = False
+        while j < n:
+            c = text[j]
+            if c == "\\":
+                j += 2
+            elif c == '"':
+                return j + 1, template
+            elif c == "\n":
+                break
+            elif text.startswith(("$${", "%%{"), j):
+                j += 3
+            elif text.startswith(("${", "%{"), j):
+                template = True
+                j = self._interpolation(j + 2)
+            else:
+                j += 1
+        raise HCLError("unterminated string", self.line(i))
+
+    def _interpolation(self, j: int) -> int:
+        text = self.text
+        n = len(text)
+        depth = 1
+        while j < n:
+            c = text[j]
+            if c == '"':
+                j, _ = self._string(j)
+                continue
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+                if depth == 0:
+                    return j + 1
+            j += 1
+        raise HCLError("unterminated template sequence", self.line(j))
+
+    def _heredoc(self, i: int, result: list[Token]) -> int:
+        text = self.text
+        m = _HEREDOC_RE.match(text, i)
+        marker = m.group(2)
+        start = m.end()
+        pos = start
+        while pos < len(text):
+            end = text.find("\n", pos)
+            end = len(text) if end < 0 else end
+            if text[pos:end].strip() == marker:
+                lines = text[start:pos].splitlines(keepends=True)
+                if m.group(1):
+                    indent = min(
+                        (len(x) - len(x.lstrip()) for x in lines if x.strip()),
+                        default=0,
+                    )
+                    lines = [x[indent:] for x in lines]
+                value = "".join(lines)
+                type = "template" if _has_template(value) else "heredoc"
+                result.append(self.token(type, value, i, end))
+                return end
+            pos = end + 1
+        raise HCLError(f"unterminated heredoc {marker}", self.line(i))
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _Lexer(text).tokens()
+        self.pos = 0
+
+    def peek(self) -> Token:
+        return self.tokens[self.pos]
+
+    def next(self) -> Token:
+        tok = self.tokens[self.pos]
+        if tok.type != "eof":
+            self.pos += 1
+        return tok
+
+    def expect(self, value: str) -> Token:
+        tok = self.next()
+        if tok.type != "punct" or tok.value != value:
+            raise HCLError(f"expected '{value}'", tok.line)
+        return tok
+
+    def body(self, nested: bool = False) -> list[Attribute | Block]:
+        items = []
+        while True:
+            tok = self.next()
+            if tok.type == "newline":
+                continue
+            if tok.type == "eof":
+                if nested:
+                    raise HCLError("unclosed block", tok.line)
+                return items
+            if nested and tok.type == "punct" and tok.value == "}":
+                return items
+            if tok.type != "ident":
+                raise HCLError("expected an attribute or block", tok.line)
+
+            nxt = self.peek()
+            if nxt.type == "punct" and nxt.value == "=":
+                self.next()
+                tokens = self.expression()
+                if not tokens:
+                    raise HCLError(f"missing value for {tok.value}", tok.line)
+                raw = self.text[tokens[0].start : tokens[-1].end]
+                items.append(Attribute(tok.value, tokens, tok.line, raw))
+                continue
+
+            labels = []
+            while self.peek().type in ("string", "ident"):
+                labels.append(self.next().value)
+            self.expect("{")
+            items.append(Block(tok.value, labels, self.body(True), tok.line))
+
+    def expression(self) -> list[Token]:
+        # an attribute value runs to the end of the line, unless the newline
+        # is inside brackets
+        depth = 0
+        tokens = []
+        while True:
+            tok = self.peek()
+            if tok.type == "eof":
+                break
+            if tok.type == "punct":
+                if tok.value in "([{":
+                    depth += 1
+                elif tok.value in ")]}":
+                    if depth == 0:
+                        break
+                    depth -= 1
+            elif tok.type == "newline" and depth == 0:
+                break
+            tokens.append(self.next())
+        return tokens
+
+
+class NotLiteral(Exception):
+    pass
+
+
+class _Literal:
+    def __init__(self, tokens: list[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Token | None:
+        while self.pos < len(self.tokens):
+            tok = self.tokens[self.pos]
+            if tok.type != "newline":
+                return tok
+            self.pos += 1
+        return None
+
+    def punct(self, value: str) -> bool:
+        tok = self.peek()
+        if tok is not None and tok.type == "punct" and tok.value == value:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        tok = self.peek()
+        if tok is None:
+            raise NotLiteral()
+        self.pos += 1
+        if tok.type in ("string", "heredoc", "number", "json"):
+            return tok.value
+        if tok.type == "ident":
+            if tok.value in ("true", "false"):
+                return tok.value == "true"
+            if tok.value == "null":
+                return None
+        elif tok.type == "punct":
+            if tok.value == "-":
+                nxt = self.peek()
+                if nxt is not None and nxt.type == "number":
+                    self.pos += 1
+                    return -nxt.value
+            elif tok.value == "[":
+                return self.sequence()
+            elif tok.value == "{":
+                return self.mapping()
+        raise NotLiteral()
+
+    def sequence(self) -> list:
+        result = []
+        while not self.punct("]"):
+            result.append(self.value())
+            if not self.punct(","):
+                if not self.punct("]"):
+                    raise NotLiteral()
+                break
+        return result
+
+    def mapping(self) -> dict:
+        result = {}
+        while not self.punct("}"):
+            tok = self.peek()
+            if tok is None or tok.type not in ("ident", "string"):
+                raise NotLiteral()
+            self.pos += 1
+            if not (self.punct("=") or self.punct(":")):
+                raise NotLiteral()
+            result[tok.value] = self.value()
+            self.punct(",")
+        return result
+
+
+def parse(text: str) -> list[Attribute | Block]:
+    """Parses the text of a ``.tf`` file into a list of attributes and blocks."""
+    return _Parser(text).body()
+
+
+def literal(tokens: list[Token]) -> Any:
+    """Evaluates an attribute value, raising :exc:`NotLiteral` if it is not a
+    plain literal (string, number, bool, null, list or object)."""
+    parser = _Literal(tokens)
+    value = parser.value()
+    if parser.peek() is not None:
+        raise NotLiteral()
+    return value
+
+
+def _attributes(block: Block) -> dict[str, Attribute]:
+    return {item.name: item for item in block.body if isinstance(item, Attribute)}
+
+
+def _literal_or_raw(attr: Attribute) -> Any:
+    try:
+        return literal(attr.tokens)
+    except NotLiteral:
+        return attr.raw
+
+
+def _string_or_raw(attr: Attribute | None) -> str:
+    if attr is None:
+        return ""
+    if len(attr.tokens) == 1 and attr.tokens[0].type == "template":
+        return attr.tokens[0].value
+    value = _literal_or_raw(attr)
+    return value if isinstance(value, str) else attr.raw
+
+
+def _leading_comments(
+    lines: list[str], index: int, should_ignore: Callable[[str], bool]
+) -> list[str]:
+    # the comment block that immediately precedes lines[index]
+    result = []
+    for line in reversed(lines[:index]):
+        line = line.lstrip()
+        if should_ignore(line):
+            continue
+        if line.startswith("#"):
+            result.append(line[1:].rstrip("\n"))
+            continue
+        break
+    return list(reversed(result))
+
+
+def _provider_ref(attr: Attribute | None, resource_type: str) -> dict:
+    if attr is None:
+        return {"name": resource_type.split("_", 1)[0]}
+    name, _, alias = str(_literal_or_raw(attr)).partition(".")
+    provider = {"name": name}
+    if alias:
+        provider["alias"] = alias
+    return provider
+
+
+def _add_provider_requirement(
+    result: dict, name: str, source: str | None, versions: list[str]
+) -> None:
+    requirement = result["required_providers"].setdefault(name, {})
+    if source:
+        requirement["source"] = source
+    if versions:
+        requirement.setdefault("version_constraints", []).extend(versions)
+
+
+def _load_blocks(
+    result: dict,
+    filename: str,
+    blocks: list[Block],
+    lines: list[str],
+    should_ignore: Callable[[str], bool],
+) -> None:
+    for block in blocks:
+        if not isinstance(block, Block):
+            continue
+        pos = {"filename": filename, "line": block.line}
+        attrs = _attributes(block)
+        item = None
+
+        if block.type == "variable" and len(block.labels) == 1:
+            name = block.labels[0]
+            item = {"name": name}
+            if "type" in attrs:
+                item["type"] = _string_or_raw(attrs["type"])
+            item["description"] = _string_or_raw(attrs.get("description"))
+            item["default"] = (
+                _literal_or_raw(attrs["default"]) if "default" in attrs else None
+            )
+            item["required"] = "default" not in attrs
+            if "sensitive" in attrs:
+                item["sensitive"] = _literal_or_raw(attrs["sensitive"]) is True
+            result["variables"][name] = item
+
+        elif block.type == "output" and len(block.labels) == 1:
+            name = block.labels[0]
+            item = {"name": name}
+            item["description"] = _string_or_raw(attrs.get("description"))
+            if "sensitive" in attrs:
+                item["sensitive"] = _literal_or_raw(attrs["sensitive"]) is True
+            result["outputs"][name] = item
+
+        elif block.type in ("resource", "data") and len(block.labels) == 2:
+            type, name = block.labels
+            item = {
+                "mode": "managed" if block.type == "resource" else "data",
+                "type": type,
+                "name": name,
+                "provider": _provider_ref(attrs.get("provider"), type),
+            }
+            if block.type == "resource":
+                result["managed_resources"][f"{type}.{name}"] = item
+            else:
+                result["data_resources"][f"data.{type}.{name}"] = item
+
+        elif block.type == "module" and len(block.labels) == 1:
+            name = block.labels[0]
+            item = {
+                "name": name,
+                "source": _string_or_raw(attrs.get("source")),
+                "version": _string_or_raw(attrs.get("version")),
+            }
+            result["module_calls"][name] = item
+
+        elif block.type == "provider" and len(block.labels) == 1:
+            versions = []
+            if "version" in attrs:
+                versions.append(_string_or_raw(attrs["version"]))
+            _add_provider_requirement(result, block.labels[0], None, versions)
+
+        elif block.type == "terraform":
+            if "required_version" in attrs:
+                result.setdefault("required_core", []).append(
+                    _string_or_raw(attrs["required_version"])
+                )
+            for child in block.body:
+                if not (isinstance(child, Block) and child.type == "required_providers"):
+                    continue
+                for name, attr in _attributes(child).items():
+                    value = _literal_or_raw(attr)
+                    if isinstance(value, dict):
+                        version = value.get("version")
+                        _add_provider_requirement(
+                            result,
+                            name,
+                            value.get("source"),
+                            [version] if isinstance(version, str) else [],
+                        )
+                    else:
+                        _add_provider_requirement(
+                            result, name, None, [_string_or_raw(attr)]
+                        )
+
+        if item is not None:
+            item["pos"] = pos
+            # emitted even when empty, so that the store does not look for
+            # the comments in the file again
+            item["doc"] = _leading_comments(lines, block.line - 1, should_ignore)
+
+
+def _json_blocks(data: dict) -> list[Block]:
+    # converts the subset of the JSON syntax that documentation needs into
+    # blocks; JSON carries no comments, and positions are not tracked
+    def body(obj: Any) -> list[Attribute | Block]:
+        items = []
+        if isinstance(obj, list):
+            obj = {k: v for o in obj if isinstance(o, dict) for k, v in o.items()}
+        if not isinstance(obj, dict):
+            return items
+        for key, value in obj.items():
+            text = json.dumps(value)
+            token = Token("json", value, 1, 0, len(text))
+            items.append(Attribute(key, [token], 1, text))
+        return items
+
+    def labelled(type: str, obj: Any, depth: int) -> list[Block]:
+        if depth == 0:
+            return [Block(type, [], body(obj), 1)]
+        if not isinstance(obj, dict):
+            return []
+        blocks = []
+        for label, value in obj.items():
+            for block in labelled(type, value, depth - 1):
+                blocks.append(Block(type, [label] + block.labels, block.body, 1))
+        return blocks
+
+    depths = {"variable": 1, "output": 1, "module": 1, "provider": 1}
+    depths.update({"resource": 2, "data": 2, "terraform": 0})
+    blocks = []
+    for type, value in data.items():
+        if type not in depths:
+            continue
+        for obj in value if isinstance(value, list) else [value]:
+            blocks.extend(labelled(type, obj, depths[type]))
+    for block in blocks:
+        if block.type == "terraform":
+            for attr in list(block.body):
+                if attr.name == "required_providers":
+                    block.body.append(
+                        Block("required_providers", [], body(attr.tokens[0].value), 1)
+                    )
+    return blocks
+
+
+def load_module(
+    fullpath: str, should_ignore: Callable[[str], bool] = lambda line: False
+) -> dict:
+    """Reads the Terraform module in ``fullpath``.
+
+    The result has the same shape as the output of ``terraform-config-inspect
+    --json``.  Objects additionally carry a ``doc`` entry holding the comment
+    lines that precede them, as lines with the leading ``#`` removed (an empty
+    list when there are none).
+    """
+    result = {
+        "path": fullpath,
+        "variables": {},
+        "outputs": {},
+        "required_providers": {},
+        "managed_resources": {},
+        "data_resources": {},
+        "module_calls": {},
+    }
+    for name in sorted(os.listdir(fullpath)):
+        filename = os.path.join(fullpath, name)
+        if name.endswith(".tf"):
+            with open(filename, "r") as f:
+                text = f.read()
+            try:
+                blocks = parse(text)
+            except HCLError as e:
+                raise HCLError(f"{filename}: {e.message}", e.line) from e
+            lines = text.splitlines(keepends=True)
+        elif name.endswith(".tf.json"):
+            with open(filename, "r") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise HCLError(f"{filename}: {e.msg}", e.lineno) from e
+            if not isinstance(data, dict):
+                raise HCLError(f"{filename}: expected a JSON object", 1)
+            blocks = _json_blocks(data)
+            lines = []
+        else:
+            continue
+        _load_blocks(result, filename, blocks, lines, should_ignore)
+
+    # terraform-config-inspect emits its maps with sorted keys
+    for key, value in result.items():
+        if isinstance(value, dict):
+            result[key] = dict(sorted(value.items()))
+    return result
@@ -0,0 +1,74 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class Metrics:
+    """Timings and counters collected while building the Terraform reference.
+
+    ``phases`` holds the wall time of every phase, ``counters`` build-wide
+    counts (inspector runs, cache hits, bytes read and written, ...), and
+    ``modules`` the same kind of figures for every module.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self.modules: dict[str, dict[str, float]] = {}
+        self.unresolved: list[str] = []
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def add(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_module(self, module: str, name: str, value: float = 1) -> None:
+        with self.lock:
+            record = self.modules.setdefault(module, {})
+            record[name] = record.get(name, 0) + value
+
+    def note_unresolved(self, target: str) -> None:
+        with self.lock:
+            self.unresolved.append(target)
+
+    def report(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "phases": {k: round(v, 6) for k, v in self.phases.items()},
+                "counters": dict(sorted(self.counters.items())),
+                "modules": {
+                    name: {k: round(v, 6) for k, v in record.items()}
+                    for name, record in sorted(self.modules.items())
+                },
+                "unresolved_xrefs": list(self.unresolved),
+            }
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{k} {v:.2f}s" for k, v in self.phases.items())
+        counters = ", ".join(
+            f"{k} {v:.0f}" if float(v).is_integer() else f"{k} {v:.2f}"
+            for k, v in sorted(self.counters.items())
+        )
+        return "; ".join(x for x in (phases, counters) if x)
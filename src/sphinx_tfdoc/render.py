@@ -0,0 +1,471 @@
+import filecmp
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from jinja2 import Environment, FileSystemLoader, Template
+from sphinx.config import Config
+from sphinx.util import status_iterator
+from sphinx.util.console import darkgreen, bold
+from sphinx.util.logging import getLogger
+from sphinx.util.parallel import ParallelTasks, make_chunks, parallel_available
+from tabulate import tabulate
+
+from .metrics import Metrics
+from .store import TerraformModule, TerraformStore
+
+
+logger = getLogger(__name__)
+
+# records the pages generated by the last build, relative to `tfdoc_target`
+MANIFEST = ".tfdoc-manifest"
+
+TEMPLATE_DIR = (Path(__file__).parent / "templates").absolute()
+
+# kind of object and title of its section, in the order of the module page
+SECTIONS = [
+    ("required_provider", "Required Providers"),
+    ("module_call", "Called Modules"),
+    ("variable", "Variables"),
+    ("managed_resource", "Resources"),
+    ("data_resource", "Data Resources"),
+    ("output", "Outputs"),
+]
+
+
+def rst_tabulate(rows):
+    table = [rows]
+    return tabulate([rows], tablefmt="grid")
+
+
+def custom_indent(s: str, width: int) -> str:
+    lines = s.splitlines()
+    lines = [" " * width + line if len(line) else line for line in lines]
+    return "\n".join(lines)
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    # leaving identical files untouched preserves their mtime, which is what
+    # sphinx uses to decide whether a document is outdated
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return True
+
+
+def stream_if_changed(path: str, chunks: Iterable[str]) -> bool:
+    # like write_if_changed, but the content is streamed to a scratch file so
+    # that a large page never has to be held in memory as a single string
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.writelines(chunks)
+    if os.path.exists(path) and filecmp.cmp(tmp, path, shallow=False):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+class IndexEntry(NamedTuple):
+    """An entry of an index page: a module page, the page of a directory or a
+    page grouping the entries of a directory beyond the maximum fan-out.
+
+    ``first`` and ``last`` are the names of the first and last modules below
+    the entry, and ``title`` is None for module pages, which have their own.
+    """
+
+    first: str
+    last: str
+    page: str
+    title: str | None = None
+
+
+class ModulePart(NamedTuple):
+    """A subpage of a module page that was split, documenting the objects of
+    one kind from ``start`` to ``stop``."""
+
+    kind: str
+    title: str
+    page: str
+    start: int
+    stop: int
+
+    @property
+    def docname(self) -> str:
+        # relative to the module page
+        return os.path.splitext(os.path.basename(self.page))[0]
+
+
+class Renderer:
+    """Renders the RST pages for the modules of a :class:`TerraformStore`.
+
+    The Jinja environment and its templates are created once; when rendering
+    in parallel, the forked workers inherit the compiled templates.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        template_paths: list[str],
+        target_dir: str | None,
+        metrics: Metrics | None = None,
+    ):
+        self.config = config
+        self.target_dir = target_dir
+        self.metrics = metrics or Metrics()
+        # stub pages only hold a tf:automodule directive, which builds the
+        # module's nodes directly instead of having docutils parse its RST; a
+        # lazy store only loads the modules whose stubs are read
+        self.lazy: bool = config.tfdoc_lazy
+        self.automodule: bool = config.tfdoc_automodule or self.lazy
+        self.env = Environment(
+            loader=FileSystemLoader(template_paths + [TEMPLATE_DIR]),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+        )
+        self.env.globals["tabulate"] = rst_tabulate
+        self.env.globals["config"] = config
+        self.env.globals["path_exists"] = os.path.exists
+        self.env.filters["indent"] = custom_indent
+        self.templates: dict[str, Template] = {}
+
+    def bind(self, store: TerraformStore) -> None:
+        """Exposes ``store`` and its inverse indexes to the templates, so that
+        a page can list e.g. the modules using a provider without scanning
+        every module."""
+        self.env.globals["store"] = store
+        self.env.globals["callers_of"] = store.callers_of
+        self.env.globals["modules_using"] = store.modules_using
+        self.env.globals["resources_of_type"] = store.resources_of_type
+
+    def template(self, name: str) -> Template:
+        if name not in self.templates:
+            self.templates[name] = self.env.get_template(name)
+        return self.templates[name]
+
+    def render_block(self, names: list[str], block: str, **context) -> str:
+        """Renders ``block`` from the first of the templates ``names`` that
+        defines it, or returns an empty string if none does."""
+        for name in names:
+            template = self.template(name)
+            if block in template.blocks:
+                return "".join(template.blocks[block](template.new_context(context)))
+        return ""
+
+    def page_template(self, module: TerraformModule) -> str:
+        return "automodule.rst" if self.automodule else f"{module.template}.rst"
+
+    def part_template(self) -> str:
+        return "automodule_part.rst" if self.automodule else "module_part.rst"
+
+    def module_page(self, module: TerraformModule) -> str:
+        return os.path.join(module.name, "index.rst")
+
+    def module_parts(self, module: TerraformModule) -> list[ModulePart]:
+        """Returns the subpages of ``module``, if it has more than
+        ``tfdoc_split_threshold`` objects: one per kind of object, each
+        holding at most ``tfdoc_split_chunk_size`` objects."""
+        threshold = self.config.tfdoc_split_threshold
+        # counting the objects of a lazy module would load it
+        if not threshold or self.lazy or len(module.children) <= threshold:
+            return []
+        size = self.config.tfdoc_split_chunk_size or len(module.children)
+        parts = []
+        for kind, title in SECTIONS:
+            count = len(getattr(module, f"{kind}s"))
+            if count <= size:
+                if count:
+                    page = os.path.join(module.name, f"{kind}s.rst")
+                    parts.append(ModulePart(kind, title, page, 0, count))
+                continue
+            for idx, start in enumerate(range(0, count, size)):
+                stop = min(start + size, count)
+                page = os.path.join(module.name, f"{kind}s-{idx + 1}.rst")
+                label = f"{title} ({start + 1}\u2013{stop})"
+                parts.append(ModulePart(kind, label, page, start, stop))
+        return parts
+
+    def module_pages(self, module: TerraformModule) -> list[str]:
+        pages = [self.module_page(module)]
+        pages.extend(part.page for part in self.module_parts(module))
+        return pages
+
+    def render_module(self, module: TerraformModule) -> dict[str, float]:
+        """Renders the pages of ``module``, returning its render metrics."""
+        sources = module.store.sources
+        files_read, bytes_read = sources.files_read, sources.bytes_read
+        start = time.perf_counter()
+        parts = self.module_parts(module)
+        template = self.template(self.page_template(module))
+        path = os.path.join(self.target_dir, self.module_page(module))
+        written = stream_if_changed(path, template.generate(module=module, parts=parts))
+        bytes_written = os.path.getsize(path) if written else 0
+        for part in parts:
+            template = self.template(self.part_template())
+            items = list(getattr(module, f"{part.kind}s").items())
+            path = os.path.join(self.target_dir, part.page)
+            chunks = template.generate(
+                module=module, part=part, items=items[part.start : part.stop]
+            )
+            if stream_if_changed(path, chunks):
+                bytes_written += os.path.getsize(path)
+        elapsed = time.perf_counter() - start
+        logger.verbose(f"[tfdoc] rendered {module.name} in {elapsed:.3f}s")
+        # docstrings are read lazily while rendering, so the source file reads
+        # are attributed to the module whose page triggered them
+        return {
+            "render_seconds": elapsed,
+            "bytes_written": bytes_written,
+            "source_files_read": sources.files_read - files_read,
+            "source_bytes_read": sources.bytes_read - bytes_read,
+        }
+
+    def _render_chunk(
+        self, modules: list[TerraformModule]
+    ) -> list[tuple[str, dict[str, float]]]:
+        return [(module.name, self.render_module(module)) for module in modules]
+
+    def _record(self, results: Iterable[tuple[str, dict[str, float]]]) -> None:
+        # forked workers cannot update the metrics of the parent process, so
+        # their results are recorded once they are sent back
+        for name, record in results:
+            for key, value in record.items():
+                self.metrics.add_module(name, key, value)
+                self.metrics.add(key, value)
+            if record["bytes_written"]:
+                self.metrics.add("pages_written")
+
+    def render_modules(
+        self, modules: list[TerraformModule], jobs: int = 1
+    ) -> dict[str, float]:
+        """Renders a page per module, returning the render time of each."""
+        # compile every template up front, so that forked workers share them
+        for module in modules:
+            self.template(self.page_template(module))
+        self.template(self.part_template())
+
+        start = time.perf_counter()
+        results: list[tuple[str, dict[str, float]]] = []
+        if jobs > 1 and parallel_available and len(modules) > 1:
+            tasks = ParallelTasks(jobs)
+            chunks = make_chunks(modules, jobs)
+            # like sphinx's parallel writes, progress is reported as the
+            # chunks are done rather than as they are queued
+            progress = status_iterator(
+                chunks,
+                bold("[tfdoc] Rendering Modules "),
+                "darkgreen",
+                len(chunks),
+                stringify_func=(lambda x: x[0].name),
+            )
+
+            def on_chunk_done(_, result):
+                results.extend(result)
+                next(progress)
+
+            for chunk in chunks:
+                tasks.add_task(self._render_chunk, chunk, on_chunk_done)
+            tasks.join()
+            logger.info("")
+        else:
+            for module in status_iterator(
+                modules,
+                bold("[tfdoc] Rendering Modules "),
+                "darkgreen",
+                len(modules),
+                stringify_func=(lambda x: x.name),
+            ):
+                results.append((module.name, self.render_module(module)))
+
+        self._record(results)
+        timings = {name: record["render_seconds"] for name, record in results}
+        if timings:
+            slowest = max(timings, key=timings.get)
+            logger.info(
+                bold("[tfdoc] rendered ")
+                + darkgreen(f"{len(timings)} modules")
+                + f" in {time.perf_counter() - start:.2f}s"
+                + f" (slowest: {slowest} {timings[slowest]:.2f}s)"
+            )
+        return timings
+
+    def render_index(self, store: TerraformStore) -> set[str]:
+        """Renders the index pages of ``store``, returning their paths.
+
+        The index follows the directories of the module names, with a page per
+        directory that lists its modules and subdirectories.  Directories with
+        a single entry are skipped, and pages with more than
+        ``tfdoc_index_fanout`` entries are split in groups, so that the
+        navigation of every page only holds its own branch.
+        """
+        modules: dict[str, list[TerraformModule]] = {"": []}
+        subdirs: dict[str, set[str]] = {"": set()}
+        for module in store.modules.values():
+            path = os.path.dirname(module.name)
+            modules.setdefault(path, []).append(module)
+            while path:
+                parent = os.path.dirname(path)
+                subdirs.setdefault(parent, set()).add(path)
+                path = parent
+
+        pages: dict[str, tuple[str, list[IndexEntry]]] = {}
+
+        def collect(path: str) -> list[IndexEntry]:
+            entries = [
+                IndexEntry(module.name, module.name, self.module_page(module))
+                for module in modules.get(path, ())
+            ]
+            for subdir in subdirs.get(path, ()):
+                children = collect(subdir)
+                if len(children) == 1:
+                    entries.extend(children)
+                    continue
+                page = os.path.join(subdir, "modules.rst")
+                pages[page] = (subdir, children)
+                entries.append(
+                    IndexEntry(children[0].first, children[-1].last, page, f"{subdir}/")
+                )
+            return sorted(entries)
+
+        pages["index.rst"] = ("Module Reference", collect(""))
+
+        generated = set()
+        fanout = self.config.tfdoc_index_fanout
+        for page, (title, entries) in pages.items():
+            base = os.path.join(os.path.dirname(page), "modules")
+            level = 0
+            while fanout and len(entries) > fanout:
+                level += 1
+                count = math.ceil(len(entries) / fanout)
+                size = math.ceil(len(entries) / count)
+                groups = []
+                for idx in range(count):
+                    chunk = entries[idx * size : (idx + 1) * size]
+                    group = IndexEntry(
+                        chunk[0].first,
+                        chunk[-1].last,
+                        f"{base}-{level}-{idx + 1}.rst",
+                        f"{chunk[0].first} \u2013 {chunk[-1].last}",
+                    )
+                    self.render_index_page(group.page, group.title, chunk)
+                    generated.add(group.page)
+                    groups.append(group)
+                entries = groups
+            self.render_index_page(page, title, entries, root=page == "index.rst")
+            generated.add(page)
+        return generated
+
+    def render_index_page(
+        self, page: str, title: str, entries: list[IndexEntry], root: bool = False
+    ) -> None:
+        template = self.template("index.rst")
+        # toctree entries are relative to the directory of the page
+        directory = os.path.dirname(page)
+        rendered = template.render(
+            title=title,
+            root=root,
+            entries=[
+                (entry.title, os.path.relpath(entry.page[:-4], directory or "."))
+                for entry in entries
+            ],
+        )
+        write_if_changed(os.path.join(self.target_dir, page), rendered)
+
+    def fingerprint(self) -> str:
+        """A digest of the templates in the search path and of the settings
+        that change every page, stored in the manifest.
+
+        Only the names and contents of the templates are hashed, so that pages
+        rendered on another machine (see ``python -m sphinx_tfdoc generate``)
+        are not considered outdated.
+        """
+        digest = hashlib.sha256(
+            f"{self.automodule}\0{self.config.tfdoc_split_threshold}\0"
+            f"{self.config.tfdoc_split_chunk_size}\0".encode()
+        )
+        # the docstrings on every page depend on the settings of the store
+        digest.update(repr(TerraformStore.settings_of(self.config)).encode())
+        for path in self.env.loader.searchpath:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    fullpath = os.path.join(root, name)
+                    with open(fullpath, "rb") as f:
+                        content = f.read()
+                    relpath = os.path.relpath(fullpath, path)
+                    digest.update(f"{relpath}\0{len(content)}\0".encode())
+                    digest.update(content)
+        return digest.hexdigest()
+
+    def read_manifest(self) -> tuple[set[str], str | None]:
+        try:
+            with open(os.path.join(self.target_dir, MANIFEST), "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return set(), None
+        if isinstance(manifest, list):
+            # written before the manifest recorded the templates
+            return set(manifest), None
+        return set(manifest["pages"]), manifest["templates"]
+
+    def render(
+        self,
+        store: TerraformStore,
+        jobs: int = 1,
+        outdated: set[str] | None = None,
+    ) -> dict[str, float]:
+        """Renders the pages of ``store``.
+
+        When ``outdated`` is given, only the pages of those modules are
+        rendered, as long as the templates did not change since the pages on
+        disk were rendered and none of them went missing.
+        """
+        self.bind(store)
+        previous, templates = self.read_manifest()
+        fingerprint = self.fingerprint()
+        modules = list(store.modules.values())
+        generated = {page for module in modules for page in self.module_pages(module)}
+        if outdated is not None and templates == fingerprint:
+            modules = [
+                module
+                for module in modules
+                if module.name in outdated
+                or not all(
+                    os.path.exists(os.path.join(self.target_dir, page))
+                    for page in self.module_pages(module)
+                )
+            ]
+        timings = self.render_modules(modules, jobs)
+        generated |= self.render_index(store)
+        self.prune(previous, generated, fingerprint)
+        return timings
+
+    def prune(self, previous: set[str], generated: set[str], fingerprint: str) -> None:
+        for relpath in sorted(previous - generated):
+            path = os.path.join(self.target_dir, relpath)
+            if not os.path.exists(path):
+                continue
+            logger.info(bold("[tfdoc] removing stale page ") + darkgreen(relpath))
+            os.remove(path)
+            # clean up the directories that only held the removed page
+            parent = os.path.dirname(path)
+            while parent != self.target_dir and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+
+        manifest = {"templates": fingerprint, "pages": sorted(generated)}
+        write_if_changed(
+            os.path.join(self.target_dir, MANIFEST), json.dumps(manifest, indent=2)
+        )
@@ -0,0 +1,117 @@
+"""Generates the module pages outside of Sphinx, optionally split in shards.
+
+``generate --shard i/n`` inspects and renders a deterministic subset of the
+module directories and writes the store it loaded as a fragment.  ``merge``
+combines the fragments of every shard into a single store, which the
+extension reads from ``tfdoc_store_file`` instead of inspecting anything, and
+renders what depends on more than one shard: the index and the pages whose
+call graph neighbours were in another shard.
+
+All shards must see the repository at the same path, since the store records
+absolute paths.
+"""
+
+import os
+
+from sphinx.errors import ExtensionError
+from sphinx.util.console import darkgreen, bold
+from sphinx.util.logging import getLogger
+
+from .extension import prepare, read_config
+from .render import Renderer
+from .store import TerraformStore
+
+
+logger = getLogger(__name__)
+
+
+def generate(
+    sourcedir: str,
+    fragment: str,
+    shard: tuple[int, int] | None = None,
+    jobs: int = 1,
+    overrides: dict | None = None,
+) -> None:
+    """Loads and renders the modules of ``shard``, writing the store they
+    were loaded into to ``fragment``."""
+    sourcedir = os.path.abspath(sourcedir)
+    config = read_config(sourcedir, overrides)
+    dirs, target_dir, template_paths, cache = prepare(config, sourcedir)
+    if target_dir is None:
+        raise ExtensionError("set `tfdoc_target` to generate pages")
+
+    store = TerraformStore(config, cache=cache)
+    store.load(dirs, recursive=config.tfdoc_recursive, jobs=jobs, shard=shard)
+    # the index and the manifest are written by merge, which sees every shard
+    renderer = Renderer(config, template_paths, target_dir)
+    renderer.bind(store)
+    renderer.render_modules(list(store.modules.values()), jobs)
+    store.write(fragment)
+    logger.info(
+        bold("[tfdoc] wrote ")
+        + darkgreen(f"{len(store.modules)} modules")
+        + f" to {fragment}"
+    )
+
+
+def merge(
+    sourcedir: str,
+    fragments: list[str],
+    store_file: str | None = None,
+    jobs: int = 1,
+    overrides: dict | None = None,
+) -> None:
+    """Combines the stores written by :func:`generate` for every shard."""
+    sourcedir = os.path.abspath(sourcedir)
+    config = read_config(sourcedir, overrides)
+    _, target_dir, template_paths, _ = prepare(config, sourcedir)
+    if target_dir is None:
+        raise ExtensionError("set `tfdoc_target` to generate pages")
+    if store_file is None and config.tfdoc_store_file:
+        store_file = os.path.join(sourcedir, config.tfdoc_store_file)
+    if store_file is None:
+        raise ExtensionError("set `tfdoc_store_file` or pass the store to write")
+
+    shards = [TerraformStore.read(path) for path in fragments]
+    # a store loaded without --shard is the one and only shard
+    found = [x.shard or (0, 1) for x in shards]
+    if sorted(found) != [(idx, len(found)) for idx in range(len(found))]:
+        raise ExtensionError(
+            "the fragments must hold every shard exactly once, got "
+            + ", ".join(f"{idx + 1}/{count}" for idx, count in found)
+        )
+
+    store = TerraformStore(config)
+    for shard in shards:
+        store.merge(shard)
+
+    # each shard rendered its pages with the call graph of its own modules, so
+    # the pages of modules that call or are called from another shard are
+    # missing links or users
+    known = set(store.modules)
+    outdated = set()
+    for shard in shards:
+        local = set(shard.modules)
+        for name in shard.modules:
+            neighbours = store.calls.get(name, set()) | store.callers.get(name, set())
+            if (neighbours & known) - local:
+                outdated.add(name)
+
+    renderer = Renderer(config, template_paths, target_dir)
+    renderer.bind(store)
+    renderer.render_modules([store.modules[name] for name in sorted(outdated)], jobs)
+    generated = {
+        page
+        for module in store.modules.values()
+        for page in renderer.module_pages(module)
+    }
+    generated |= renderer.render_index(store)
+    previous, _ = renderer.read_manifest()
+    renderer.prune(previous, generated, renderer.fingerprint())
+
+    store.write(store_file)
+    logger.info(
+        bold("[tfdoc] merged ")
+        + darkgreen(f"{len(shards)} shards")
+        + f" ({len(store.modules)} modules) into {store_file}"
+    )
@@ -1,18 +1,43 @@
+import copy
 import json
 import os
+import pickle
 import re
 import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable
 
 from sphinx.config import Config
 from sphinx.errors import ExtensionError
 from sphinx.util import status_iterator
 from sphinx.util.console import darkgreen, bold
 from sphinx.util.logging import getLogger
+from sphinx.util.matching import Matcher
+
+from .cache import (
+    TF_SUFFIXES,
+    InspectCache,
+    SourceCache,
+    _rebase,
+    _tf_files,
+    content_digests,
+    fingerprint,
+)
+from .hcl import HCLError, load_module
+from .metrics import Metrics
 
 
 logger = getLogger(__name__)
 
 
+class InspectError(ExtensionError):
+    """A module directory could not be inspected."""
+
+
 def _strip_leading_spaces(lines: list[str]) -> list[str]:
     if lines:
         spaces = min([len(line) - len(line.lstrip()) for line in lines if len(line)])
@@ -20,8 +45,8 @@ def _strip_leading_spaces(lines: list[str]) -> list[str]:
     return lines
 
 
-def _should_ignore(config: Config, line: str) -> bool:
-    for pat in config.tfdoc_docstring_ignores:
+def _should_ignore(patterns: list[str | re.Pattern], line: str) -> bool:
+    for pat in patterns:
         if isinstance(pat, str):
             if pat in line:
                 return True
@@ -31,25 +56,137 @@ def _should_ignore(config: Config, line: str) -> bool:
     return False
 
 
+def in_shard(path: str, shard: tuple[int, int]) -> bool:
+    """Whether the module directory ``path`` belongs to ``shard``.
+
+    Directories are assigned by a hash of their path, so that adding or
+    removing one does not move the others to a different shard.
+    """
+    index, count = shard
+    return zlib.crc32(path.encode()) % count == index
+
+
+def _skipped(relpath: str, exclude: Matcher) -> bool:
+    # whether walk_modules() would skip the directory at relpath
+    parts = relpath.replace(os.sep, "/").split("/")
+    for idx, part in enumerate(parts):
+        if part == ".":
+            continue
+        if part.startswith(".") or exclude("/".join(parts[: idx + 1])):
+            return True
+    return False
+
+
+def walk_modules(scan_dir: str, exclude: Matcher, start: str = ".") -> list[str]:
+    """Returns the directories below ``scan_dir`` (relative to it) that hold
+    Terraform files, only looking below ``start`` (also relative to it).
+
+    Hidden directories such as ``.terraform`` or ``.git`` are never entered,
+    and neither are directories matching ``exclude``.
+    """
+    found = []
+    pending = [start]
+    while pending:
+        relpath = pending.pop()
+        has_tf = False
+        try:
+            with os.scandir(os.path.join(scan_dir, relpath)) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.startswith("."):
+                            continue
+                        child = os.path.normpath(os.path.join(relpath, entry.name))
+                        if exclude(child.replace(os.sep, "/")):
+                            continue
+                        pending.append(child)
+                    elif not has_tf and entry.name.endswith(TF_SUFFIXES):
+                        has_tf = True
+        except OSError as e:
+            logger.warning(f"[tfdoc] could not scan {relpath}: {e}")
+            continue
+        if has_tf:
+            found.append(relpath)
+    return found
+
+
 class TerraformModule:
+    __slots__ = (
+        "store",
+        "name",
+        "root",
+        "path",
+        "data_resources",
+        "managed_resources",
+        "module_calls",
+        "outputs",
+        "required_providers",
+        "variables",
+        "_children",
+        "_docstring",
+        "_loaded",
+    )
     template = "module"
-
-    def __init__(self, config: Config, name: str, root: str):
-        self.config = config
+    # the slots holding the objects, which a lazy module leaves unset until
+    # they are first accessed
+    objects = (
+        "data_resources",
+        "managed_resources",
+        "module_calls",
+        "outputs",
+        "required_providers",
+        "variables",
+    )
+
+    def __init__(
+        self, store: "TerraformStore", name: str, root: str, lazy: bool = False
+    ):
+        self.store = store
         # a module is named from its path relative to the root that discovered the module
         # root is the path that was used to discover the module
-        self.name = name
-        self.root = root
+        self.name = sys.intern(name)
+        self.root = sys.intern(root)
         self.path = os.path.join(root, name)
+        self._children: tuple[TerraformObjectBase, ...] | None = None
+        self._loaded = not lazy
+        if not lazy:
+            self.clear()
+
+    def __str__(self) -> str:
+        return f"tf:module {self.name}"
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for unset slots: the objects of a lazy module are loaded
+        # on first access
+        if name not in TerraformModule.objects or self._loaded:
+            raise AttributeError(name)
+        self.store.load_module(self)
+        return object.__getattribute__(self, name)
+
+    def __getstate__(self) -> tuple[None, dict[str, Any]]:
+        # the default state of a slotted object reads every slot, which would
+        # load a lazy module when the store is pickled
+        state = {}
+        for name in self.__slots__:
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+        return None, state
+
+    @property
+    def loaded(self) -> bool:
+        """False until the objects of a lazy module were loaded."""
+        return self._loaded
+
+    def clear(self) -> None:
         self.data_resources: dict[str, TerraformDataResource] = {}
         self.managed_resources: dict[str, TerraformManagedResource] = {}
         self.module_calls: dict[str, TerraformModuleCall] = {}
         self.outputs: dict[str, TerraformOutput] = {}
         self.required_providers: dict[str, TerraformRequiredProvider] = {}
         self.variables: dict[str, TerraformVariable] = {}
-
-    def __str__(self) -> str:
-        return f"tf:module {self.name}"
+        self._children = None
+        self._loaded = True
 
     def add_child(self, name: str, obj: "TerraformObjectBase") -> None:
         if isinstance(obj, TerraformDataResource):
@@ -66,21 +203,47 @@ class TerraformModule:
             self.variables[name] = obj
         else:
             raise ExtensionError("could not add child")
+        self._children = None
 
     @property
     def empty(self) -> bool:
-        return not bool(self.children)
+        return not (
+            self.data_resources
+            or self.managed_resources
+            or self.module_calls
+            or self.outputs
+            or self.required_providers
+            or self.variables
+        )
 
     @property
-    def children(self) -> list["TerraformObjectBase"]:
-        return (
-            list(self.data_resources.values())
-            + list(self.managed_resources.values())
-            + list(self.module_calls.values())
-            + list(self.outputs.values())
-            + list(self.required_providers.values())
-            + list(self.variables.values())
-        )
+    def children(self) -> tuple["TerraformObjectBase", ...]:
+        # built once, on first access after the last add_child()
+        if self._children is None:
+            self._children = (
+                *self.data_resources.values(),
+                *self.managed_resources.values(),
+                *self.module_calls.values(),
+                *self.outputs.values(),
+                *self.required_providers.values(),
+                *self.variables.values(),
+            )
+        return self._children
+
+    def share(self, origin: "TerraformModule") -> None:
+        """Takes the docstrings of ``origin``, an identical copy of this module
+        in another directory, so that only the files of one copy are read."""
+        self._docstring = origin.docstring
+        for child in self.children:
+            twin = getattr(origin, f"{child.kind}s").get(child.name)
+            if twin is not None:
+                child.doc = tuple(twin.comments)
+
+    @property
+    def used_by(self) -> list["TerraformModule"]:
+        """The modules of the store that call this module, empty unless the
+        call graph of the store is complete."""
+        return self.store.callers_of(self.name)
 
     @property
     def docstring(self) -> str | None:
@@ -88,27 +251,10 @@ class TerraformModule:
             return self._docstring
 
         result = []
-        for filename in self.config.tfdoc_module_docstring_files:
+        for filename in self.store.docstring_files:
             fullpath = os.path.join(self.root, self.path, filename)
             if os.path.exists(fullpath):
-                with open(fullpath, "r") as f:
-                    lines = f.readlines()
-                in_comment = False
-                for line in lines:
-                    line = line.lstrip()
-                    if not in_comment:
-                        if _should_ignore(self.config, line):
-                            continue
-                        if line.startswith("#"):
-                            in_comment = True
-                            result.append(line[1:].rstrip("\n"))
-                    else:
-                        if _should_ignore(self.config, line):
-                            continue
-                        if line.startswith("#"):
-                            result.append(line[1:].rstrip("\n"))
-                        else:
-                            break
+                result = list(self.store.sources.header(fullpath))
                 if result:
                     break
 
@@ -121,216 +267,773 @@ class TerraformModule:
 
 
 class TerraformObjectBase:
-    kind: str = "base"
+    """An object of a module, keeping only the fields of the inspector data
+    that are documented.
 
-    def __init__(self, config: Config, module: TerraformModule, data: dict):
-        self.config = config
-        self.module = module
-        self.data = data
+    Stores can hold tens of thousands of objects, so they use ``__slots__`` and
+    intern the strings that repeat across objects (file names, types).
+    """
 
-    @property
-    def filename(self) -> str:
-        return self.data["pos"]["filename"]
+    __slots__ = ("module", "name", "filename", "line", "doc", "_docstring")
+    kind: str = "base"
 
-    @property
-    def line(self) -> int:
-        return self.data["pos"]["line"] - 1
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        self.module = module
+        self.name = sys.intern(key)
+        # required providers carry no position
+        pos = data.get("pos") or {}
+        self.filename = sys.intern(pos.get("filename", ""))
+        self.line = pos.get("line", 1) - 1
+        # the native backend captures the comment block while parsing
+        self.doc: tuple[str, ...] | None = (
+            tuple(data["doc"]) if "doc" in data else None
+        )
 
     @property
     def template(self) -> str:
         return self.kind
 
+    @property
+    def comments(self) -> list[str]:
+        """The comment block right above the object."""
+        if self.doc is not None:
+            return list(self.doc)
+        if self.line != 0:
+            return list(self.module.store.sources.comments(self.filename, self.line))
+        return []
+
     @property
     def docstring(self) -> str | None:
         if hasattr(self, "_docstring"):
             return self._docstring
 
-        with open(self.filename, "r") as f:
-            lines = f.readlines()
-
-        result = []
-        if self.line != 0:
-            for line in reversed(lines[: self.line]):
-                line = line.lstrip()
-                if _should_ignore(self.config, line):
-                    continue
-                if line.startswith("#"):
-                    result.append(line[1:].rstrip("\n"))
-                    continue
-                break
-
+        result = self.comments
         if not result:
             return None
 
-        result = list(reversed(result))
         result += [""]
         self._docstring = "\n".join(_strip_leading_spaces(result))
         return self._docstring
 
 
 class TerraformVariable(TerraformObjectBase):
+    __slots__ = ("type", "required", "_default")
     kind = "variable"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.name = key
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        super().__init__(module, key, data)
+        lines = data.get("type", "any").split("\n")
+        lines = [line if idx == 0 else line[2:] for idx, line in enumerate(lines)]
+        self.type = sys.intern("\n".join(lines))
+        self.required: bool = data["required"]
+        self._default = data.get("default")
 
     def __str__(self) -> str:
         return f"tf:variable {self.name}"
 
-    @property
-    def type(self) -> str:
-        lines = self.data["type"].split("\n")
-        lines = [line if idx == 0 else line[2:] for idx, line in enumerate(lines)]
-        return "\n".join(lines)
-
     @property
     def default(self) -> str:
-        default = self.data.get("default")
+        default = self._default
         if default is None:
             default = "null"
         else:
             default = json.dumps(default, indent=2)
         return default
 
-    @property
-    def required(self) -> bool:
-        return self.data["required"]
-
 
 class TerraformOutput(TerraformObjectBase):
+    __slots__ = ()
     kind = "output"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.name = key
-
     def __str__(self) -> str:
         return f"tf:output {self.name}"
 
 
 class TerraformManagedResource(TerraformObjectBase):
+    __slots__ = ("resource_type", "provider")
     kind = "managed_resource"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.kind = ".".join(key.split(".")[0:-1])
-        self.name = data["name"]
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        super().__init__(module, data["name"], data)
+        self.resource_type = sys.intern(data["type"])
+        # the local name of the provider, implied by the type unless set
+        provider = (data.get("provider") or {}).get("name")
+        self.provider = sys.intern(provider or self.resource_type.split("_", 1)[0])
 
     def __str__(self) -> str:
-        return f"tf:resource {self.kind} {self.name}"
-
-    @property
-    def resource_type(self):
-        return self.data["type"]
+        return f"tf:resource {self.resource_type} {self.name}"
 
 
 class TerraformDataResource(TerraformObjectBase):
+    __slots__ = ("resource_type", "provider")
     kind = "data_resource"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.kind = ".".join(key.split(".")[1:-1])
-        self.name = data["name"]
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        super().__init__(module, data["name"], data)
+        self.resource_type = sys.intern(data["type"])
+        # the local name of the provider, implied by the type unless set
+        provider = (data.get("provider") or {}).get("name")
+        self.provider = sys.intern(provider or self.resource_type.split("_", 1)[0])
 
     def __str__(self) -> str:
-        return f"tf:data {self.kind} {self.name}"
-
-    @property
-    def resource_type(self):
-        return self.data["type"]
+        return f"tf:data {self.resource_type} {self.name}"
 
 
 class TerraformModuleCall(TerraformObjectBase):
+    __slots__ = ("source", "local")
     kind = "module_call"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.name = key
-        self.source = os.path.relpath(
-            os.path.normpath(
-                os.path.join(os.path.dirname(data["pos"]["filename"]), data["source"])
-            ),
-            self.module.root,
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        super().__init__(module, key, data)
+        # terraform only treats paths starting with ./ or ../ as local modules
+        self.local: bool = data["source"].startswith(("./", "../"))
+        self.source = sys.intern(
+            os.path.relpath(
+                os.path.normpath(
+                    os.path.join(os.path.dirname(self.filename), data["source"])
+                ),
+                self.module.root,
+            )
         )
 
     def __str__(self) -> str:
         return f"tf:module_call {self.name} {self.source}"
 
+    @property
+    def target(self) -> TerraformModule | None:
+        """The called module, if it is a local module of the store."""
+        if not self.local:
+            return None
+        return self.module.store.modules.get(self.source)
+
 
 class TerraformRequiredProvider(TerraformObjectBase):
+    __slots__ = ("source", "version_constraints")
     kind = "required_provider"
 
-    def __init__(self, config: Config, module: TerraformModule, key: str, data: dict):
-        super().__init__(config, module, data)
-        self.name = key
-        self.provider = key
+    def __init__(self, module: TerraformModule, key: str, data: dict):
+        super().__init__(module, key, data)
+        source = data.get("source", None)
+        self.source: str | None = sys.intern(source) if source else source
+        constraints = data.get("version_constraints", [])
+        self.version_constraints: str | None = (
+            sys.intern(", ".join(constraints)) if constraints else None
+        )
 
     def __str__(self) -> str:
         return f"tf:provider {self.provider}"
 
     @property
-    def docstring(self) -> str | None:
-        return None
-
-    @property
-    def source(self) -> str | None:
-        return self.data.get("source", None)
+    def provider(self) -> str:
+        return self.name
 
     @property
-    def version_constraints(self) -> str | None:
-        s = self.data.get("version_constraints", [])
-        if not s:
-            return None
-        return ", ".join(s)
+    def docstring(self) -> str | None:
+        return None
 
 
 TF_OBJ_MAP = {cls.kind: cls for cls in TerraformObjectBase.__subclasses__()}
 
 
 class TerraformStore:
-    def __init__(self, config: Config):
+    """The Terraform modules found in `tfdoc_dirs`.
+
+    The store only keeps the settings it needs rather than the Sphinx config,
+    so that it can be pickled along with the build environment and reused by
+    the next build.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        cache: InspectCache | None = None,
+        metrics: Metrics | None = None,
+    ):
         self.modules: dict[str, TerraformModule] = {}
-        self.config = config
+        self.backend: str = config.tfdoc_backend
+        self.docstring_files: list[str] = list(config.tfdoc_module_docstring_files)
+        self.docstring_ignores = list(config.tfdoc_docstring_ignores)
+        self.exclude_patterns: list[str] = list(config.tfdoc_exclude_patterns)
+        # seconds, 0 for no timeout
+        self.inspect_timeout: float | None = config.tfdoc_inspect_timeout or None
+        self.skip_failures: bool = config.tfdoc_skip_failures
+        # discovery only creates lazy modules, inspected on first access
+        self.lazy: bool = config.tfdoc_lazy
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.sources = SourceCache(
+            partial(_should_ignore, self.docstring_ignores),
+            config.tfdoc_source_cache_size,
+        )
+        # fingerprint of every inspected directory, used to reload incrementally
+        self.fingerprints: dict[str, str] = {}
+        # directories that could not be inspected, with the error; they are
+        # not inspected again until their fingerprint changes
+        self.failures: dict[str, str] = {}
+        # the directories passed to load(), and the (root, path) of every
+        # directory it found, which reload() updates in place
+        self.dirs: list[str] = []
+        self.recursive = True
+        self.found: list[tuple[str, str]] = []
+        # the (index, count) of the shard loaded by load(), see in_shard()
+        self.shard: tuple[int, int] | None = None
+        # names of the modules that were added, (re)loaded or removed compared
+        # to the store passed to load()
+        self.added: set[str] = set()
+        self.changed: set[str] = set()
+        self.removed: set[str] = set()
+        # local module calls: module -> modules it calls, and the inverse; the
+        # called modules need not exist
+        self.calls: dict[str, set[str]] = {}
+        self.callers: dict[str, set[str]] = {}
+        # inverse indexes built along with the call graph: provider -> modules
+        # using it, and resource type -> managed and data resources of the type
+        self.providers: dict[str, set[str]] = {}
+        self.resource_types: dict[str, list[TerraformObjectBase]] = {}
+        # modules whose pages show something that changed since the previous
+        # build: the modules themselves and their neighbours in the call graph
+        self.outdated: set[str] = set()
+        # the paths that builds with tfdoc_changed_since reloaded on top of the
+        # baseline, where the store may differ from the ref it was built from
+        self.patched: set[str] = set()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # the on-disk cache and the metrics belong to a single build
+        state["cache"] = None
+        state["metrics"] = Metrics()
+        return state
+
+    @staticmethod
+    def settings_of(config: Config) -> tuple:
+        """The settings that the loaded modules depend on, see `reusable`."""
+        return (
+            config.tfdoc_backend,
+            list(config.tfdoc_module_docstring_files),
+            list(config.tfdoc_docstring_ignores),
+            bool(config.tfdoc_lazy),
+        )
 
-    def load(self, dirs: list[str], recursive: bool = True) -> bool:
+    def reusable(self, config: Config) -> bool:
+        """Whether a build with ``config`` can take its modules from this store.
+
+        The modules keep the docstrings computed when they were loaded, and
+        the backend and lazy state they were loaded with, so a store loaded
+        with other settings must be discarded.
+        """
+        settings = (
+            self.backend,
+            self.docstring_files,
+            self.docstring_ignores,
+            self.lazy,
+        )
+        return settings == self.settings_of(config)
+
+    def fingerprint(self, fullpath: str) -> str:
+        return fingerprint(fullpath, self.docstring_files)
+
+    def load(
+        self,
+        dirs: list[str],
+        recursive: bool = True,
+        jobs: int = 1,
+        previous: "TerraformStore | None" = None,
+        shard: tuple[int, int] | None = None,
+    ) -> bool:
+        start = time.perf_counter()
+        self.dirs = list(dirs)
+        self.recursive = recursive
+        self.shard = shard
         found_paths = set()
         if recursive:
+            exclude = Matcher(self.exclude_patterns)
             for scan_dir in dirs:
-                for root, _, _ in os.walk(scan_dir):
-                    found_paths.add((scan_dir, os.path.relpath(root, scan_dir)))
+                for path in walk_modules(scan_dir, exclude):
+                    found_paths.add((scan_dir, path))
         else:
             for scan_dir in dirs:
                 found_paths.add((os.path.dirname(scan_dir), os.path.basename(scan_dir)))
 
-        for root, path in status_iterator(
-            found_paths,
-            bold("[tfdoc] Loading Data "),
-            "darkgreen",
-            len(found_paths),
-            stringify_func=(lambda x: os.path.join(*x)),
-        ):
+        if shard is not None:
+            found_paths = {x for x in found_paths if in_shard(x[1], shard)}
+
+        # sort so that modules are always added to the store in the same order,
+        # regardless of how the inspections are scheduled
+        found_paths = sorted(found_paths)
+
+        # directories whose fingerprint did not change since the previous build
+        # reuse its module, anything else is inspected again
+        reused: dict[tuple[str, str], TerraformModule | None] = {}
+        pending = []
+        for root, path in found_paths:
+            fullpath = os.path.join(root, path)
+            self.fingerprints[fullpath] = self.fingerprint(fullpath)
+            if (
+                previous is not None
+                and previous.fingerprints.get(fullpath) == self.fingerprints[fullpath]
+            ):
+                reused[(root, path)] = previous.modules.get(path)
+                if fullpath in previous.failures:
+                    self.note_failure(fullpath, previous.failures[fullpath])
+            else:
+                pending.append((root, path))
+        self.metrics.add_phase("discovery", time.perf_counter() - start)
+        self.metrics.add("directories", len(found_paths))
+        self.metrics.add("modules_reused", sum(1 for m in reused.values() if m))
+
+        loaded = self._inspect_all(pending, jobs)
+        self._assemble(found_paths, reused, loaded, previous)
+
+        if self.cache is not None:
+            self.cache.prune()
+
+        return True
+
+    def reload(self, paths: Iterable[str], jobs: int = 1) -> bool:
+        """Reloads the modules affected by the files or directories ``paths``
+        that changed since the last load (e.g. as reported by a file watcher).
+
+        Every other directory is assumed unchanged and is neither walked nor
+        fingerprinted again; the result is the same as a load() of the same
+        directories with this store as the previous one.
+        """
+        start = time.perf_counter()
+        previous = copy.copy(self)
+        exclude = Matcher(self.exclude_patterns)
+        found = set(self.found)
+        touched = set()
+        for fullpath in paths:
+            fullpath = os.path.abspath(fullpath)
+            for scan_dir in self.dirs:
+                if not self.recursive:
+                    if scan_dir in (fullpath, os.path.dirname(fullpath)):
+                        key = (os.path.dirname(scan_dir), os.path.basename(scan_dir))
+                        touched.add(key)
+                    continue
+                if fullpath != scan_dir and not fullpath.startswith(scan_dir + os.sep):
+                    continue
+                # directories that went away, along with everything below them
+                for root, path in list(found):
+                    directory = os.path.join(root, path)
+                    if (
+                        root == scan_dir
+                        and (directory + os.sep).startswith(fullpath + os.sep)
+                        and not os.path.isdir(directory)
+                    ):
+                        found.discard((root, path))
+                        touched.add((root, path))
+                if os.path.isdir(fullpath):
+                    relpath = os.path.relpath(fullpath, scan_dir)
+                    if not _skipped(relpath, exclude):
+                        for path in walk_modules(scan_dir, exclude, relpath):
+                            found.add((scan_dir, path))
+                            touched.add((scan_dir, path))
+                else:
+                    relpath = os.path.relpath(os.path.dirname(fullpath), scan_dir)
+                    if not _skipped(relpath, exclude):
+                        touched.add((scan_dir, relpath))
+
+        reused = {key: previous.modules.get(key[1]) for key in found - touched}
+        pending = []
+        for root, path in sorted(touched):
             fullpath = os.path.join(root, path)
-            data = json.loads(
-                subprocess.check_output(
-                    ["terraform-config-inspect", "--json", fullpath]
-                )
+            self.sources.invalidate(fullpath)
+            if not _tf_files(fullpath):
+                found.discard((root, path))
+                self.fingerprints.pop(fullpath, None)
+                self.failures.pop(fullpath, None)
+                continue
+            digest = self.fingerprint(fullpath)
+            if self.fingerprints.get(fullpath) == digest:
+                reused[(root, path)] = previous.modules.get(path)
+                if fullpath in self.failures:
+                    self.note_failure(fullpath, self.failures[fullpath])
+            else:
+                found.add((root, path))
+                self.fingerprints[fullpath] = digest
+                pending.append((root, path))
+        self.metrics.add_phase("discovery", time.perf_counter() - start)
+        self.metrics.add("directories", len(touched))
+
+        loaded = self._inspect_all(pending, jobs)
+        self.added, self.changed, self.removed = set(), set(), set()
+        self._assemble(sorted(found), reused, loaded, previous)
+
+        if self.cache is not None:
+            self.cache.prune()
+
+        return True
+
+    def _inspect_all(
+        self, pending: list[tuple[str, str]], jobs: int
+    ) -> dict[tuple[str, str], TerraformModule | None]:
+        if self.lazy:
+            return {
+                (root, path): TerraformModule(self, path, root, lazy=True)
+                for root, path in pending
+            }
+        loaded: dict[tuple[str, str], TerraformModule | None] = {}
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            # identical copies of a module (e.g. vendored into several
+            # directories) are only inspected once; the digest of the
+            # Terraform files alone also keys the inspector cache
+            digests = executor.map(
+                lambda x: content_digests(os.path.join(*x), self.docstring_files),
+                pending,
             )
-            if not data:
+            contents: dict[tuple[str, str], str] = {}
+            origins: dict[str, tuple[str, str]] = {}
+            copies: dict[tuple[str, str], tuple[str, str]] = {}
+            for key, (content, digest) in zip(pending, digests):
+                contents[key] = content
+                if digest in origins:
+                    copies[key] = origins[digest]
+                else:
+                    origins[digest] = key
+            unique = [key for key in pending if key not in copies]
+            copied = set(copies.values())
+
+            # the inspector runs in a subprocess, so threads are enough to keep
+            # `jobs` of them busy; map() yields results in submission order
+            results = executor.map(
+                self._inspect_key, unique, [contents[key] for key in unique]
+            )
+            originals: dict[tuple[str, str], dict] = {}
+            try:
+                for key, data in status_iterator(
+                    zip(unique, results),
+                    bold("[tfdoc] Loading Data "),
+                    "darkgreen",
+                    len(unique),
+                    stringify_func=(lambda x: os.path.join(*x[0])),
+                ):
+                    if key in copied:
+                        originals[key] = data
+                    loaded[key] = self.create_module(*key, data)
+            except InspectError:
+                # the build fails anyway, so the inspections still queued are
+                # dropped rather than waited for
+                executor.shutdown(cancel_futures=True)
+                raise
+
+        for key, origin in copies.items():
+            src, dst = os.path.join(*origin), os.path.join(*key)
+            if originals[origin] is None:
+                self.note_failure(dst, self.failures[src])
+                loaded[key] = None
                 continue
-            module = TerraformModule(self.config, path, root)
+            self.failures.pop(dst, None)
+            data = copy.deepcopy(originals[origin])
+            _rebase(data, lambda x: os.path.join(dst, os.path.relpath(x, src)))
+            loaded[key] = module = self.create_module(*key, data)
+            if module is not None:
+                module.share(loaded[origin])
+        self.metrics.add("modules_deduplicated", len(copies))
+        return loaded
+
+    def _inspect_key(
+        self, key: tuple[str, str], content: str | None = None
+    ) -> dict | None:
+        fullpath = os.path.join(*key)
+        try:
+            data = self.inspect(fullpath, name=key[1], content=content)
+        except InspectError as e:
+            if not self.skip_failures:
+                raise
+            self.note_failure(fullpath, str(e))
+            return None
+        self.failures.pop(fullpath, None)
+        return data
+
+    def note_failure(self, fullpath: str, error: str) -> None:
+        """Records that ``fullpath`` could not be inspected, leaving it out of
+        the store."""
+        self.failures[fullpath] = error
+        self.metrics.add("inspect_failures")
+        logger.warning(f"[tfdoc] skipping {fullpath}: {error}")
+
+    def load_module(self, module: TerraformModule) -> None:
+        """Inspects a lazy module and creates its objects."""
+        start = time.perf_counter()
+        data = self._inspect_key((module.root, module.name))
+        module.clear()
+        if data:
             for obj in self.create_objects(module, data):
                 module.add_child(obj.name, obj)
-            if module.empty:
+        self._index_module(module)
+        self.metrics.add("modules_loaded_lazily")
+        self.metrics.add_phase("lazy_load", time.perf_counter() - start)
+
+    def adopt(self, other: "TerraformStore") -> None:
+        """Takes the modules that ``other``, the copy of this store in a
+        parallel reader process, loaded lazily."""
+        for name, module in other.modules.items():
+            mine = self.modules.get(name)
+            if mine is None or mine.loaded or not module.loaded:
                 continue
-            self.modules[module.name] = module
+            if mine.path != module.path:
+                continue
+            # the objects move to the module of this store, which is the one
+            # the rest of the build knows
+            mine._loaded = True
+            for attr in TerraformModule.objects:
+                setattr(mine, attr, getattr(module, attr))
+            mine._children = None
+            for child in mine.children:
+                child.module = mine
+            if module.path in other.failures:
+                self.failures[module.path] = other.failures[module.path]
+            self._index_module(mine)
+            self.metrics.add("modules_loaded_lazily")
+
+    def create_module(
+        self, root: str, path: str, data: dict | None
+    ) -> TerraformModule | None:
+        if not data:
+            return None
+        module = TerraformModule(self, path, root)
+        for obj in self.create_objects(module, data):
+            module.add_child(obj.name, obj)
+        if module.empty:
+            return None
+        return module
+
+    def _assemble(
+        self,
+        found_paths: list[tuple[str, str]],
+        reused: dict[tuple[str, str], TerraformModule | None],
+        loaded: dict[tuple[str, str], TerraformModule | None],
+        previous: "TerraformStore | None",
+    ) -> None:
+        self.found = found_paths
+        modules: dict[str, TerraformModule] = {}
+        for key in found_paths:
+            if key in reused:
+                module = reused[key]
+                if module is not None and module.root != key[0]:
+                    module = None
+                if module is not None:
+                    module.store = self
+            else:
+                module = loaded[key]
+                if module is not None:
+                    if previous is not None and module.name in previous.modules:
+                        self.changed.add(module.name)
+                    else:
+                        self.added.add(module.name)
+            if module is not None:
+                modules[module.name] = module
+        self.modules = modules
+        if previous is not None:
+            self.removed = set(previous.modules) - set(self.modules)
+
+        self.build_graph()
+        self.outdated = self.find_outdated(previous)
+
+    def merge(self, other: "TerraformStore") -> None:
+        """Adds the modules loaded by ``other``, e.g. for another shard."""
+        for module in other.modules.values():
+            module.store = self
+        self.dirs = other.dirs
+        self.recursive = other.recursive
+        self.fingerprints.update(other.fingerprints)
+        self.failures.update(other.failures)
+        self.found = sorted(set(self.found) | set(other.found))
+        # keep the order of a store that loaded every directory at once
+        order = {key: idx for idx, key in enumerate(self.found)}
+        modules = {**self.modules, **other.modules}
+        self.modules = dict(
+            sorted(modules.items(), key=lambda x: order[(x[1].root, x[1].name)])
+        )
+        self.build_graph()
+
+    def compare(self, previous: "TerraformStore | None") -> None:
+        """Works out what changed since ``previous`` for a store that was not
+        loaded with it, e.g. one merged from shards."""
+        self.added, self.changed, self.removed = set(), set(), set()
+        for name, module in self.modules.items():
+            digest = self.fingerprints.get(module.path)
+            if previous is None or name not in previous.modules:
+                self.added.add(name)
+            elif previous.fingerprints.get(module.path) != digest:
+                self.changed.add(name)
+        if previous is not None:
+            self.removed = set(previous.modules) - set(self.modules)
+        self.outdated = self.find_outdated(previous)
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def read(cls, path: str) -> "TerraformStore":
+        try:
+            with open(path, "rb") as f:
+                store = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            raise ExtensionError(f"could not read tfdoc store {path}: {e}") from e
+        if not isinstance(store, cls):
+            raise ExtensionError(f"{path} does not hold a tfdoc store")
+        return store
+
+    def build_graph(self) -> None:
+        """Builds the call graph and the inverse indexes, in a single pass over
+        the objects of the store."""
+        self.calls = {}
+        self.callers = {}
+        self.providers = {}
+        self.resource_types = {}
+        for module in self.modules.values():
+            # lazy modules are added once loaded
+            if module.loaded:
+                self._index_module(module)
+
+    def _index_module(self, module: TerraformModule) -> None:
+        for call in module.module_calls.values():
+            if not call.local:
+                continue
+            self.calls.setdefault(module.name, set()).add(call.source)
+            self.callers.setdefault(call.source, set()).add(module.name)
+        for name in module.required_providers:
+            self.providers.setdefault(name, set()).add(module.name)
+        for resources in (module.managed_resources, module.data_resources):
+            for resource in resources.values():
+                self.providers.setdefault(resource.provider, set()).add(module.name)
+                by_type = self.resource_types.setdefault(resource.resource_type, [])
+                by_type.append(resource)
 
-        return True
+    @property
+    def complete(self) -> bool:
+        """Whether the call graph and the inverse indexes cover every module.
+
+        A lazy store only indexes the modules loaded so far, which depends on
+        the order (and the processes) the documents are read in, so its
+        queries return nothing rather than partial results.
+        """
+        return not self.lazy
+
+    def callers_of(self, name: str) -> list[TerraformModule]:
+        """The modules of the store that call the module ``name``."""
+        if not self.complete:
+            return []
+        return [
+            self.modules[caller]
+            for caller in sorted(self.callers.get(name, ()))
+            if caller in self.modules
+        ]
+
+    def modules_using(self, provider: str) -> list[TerraformModule]:
+        """The modules that require ``provider`` or have resources of it."""
+        if not self.complete:
+            return []
+        return [self.modules[name] for name in sorted(self.providers.get(provider, ()))]
+
+    def resources_of_type(self, resource_type: str) -> list[TerraformObjectBase]:
+        """The managed and data resources of ``resource_type``."""
+        if not self.complete:
+            return []
+        return sorted(
+            self.resource_types.get(resource_type, ()),
+            key=lambda x: (x.module.name, x.kind, x.name),
+        )
+
+    def find_outdated(self, previous: "TerraformStore | None") -> set[str]:
+        """Returns the modules whose pages are affected by the changes since
+        ``previous``, or every module when there is no previous store."""
+        if previous is None:
+            return set(self.modules)
+
+        outdated = self.added | self.changed | self.removed
+        # a module coming or going turns the links of its callers on or off
+        for name in self.added | self.removed:
+            outdated |= self.callers.get(name, set())
+            outdated |= previous.callers.get(name, set())
+        # and the modules it started or stopped calling list it as a user
+        for name in self.added | self.changed | self.removed:
+            outdated |= self.calls.get(name, set()) ^ previous.calls.get(name, set())
+        return outdated & (set(self.modules) | self.removed)
+
+    def inspect(
+        self, fullpath: str, name: str | None = None, content: str | None = None
+    ) -> dict:
+        """Inspects the module directory ``fullpath``; ``content`` is its
+        `content_digest`, when the caller already computed it."""
+        name = name or fullpath
+        if self.cache is not None:
+            key = self.cache.key(fullpath, content)
+            data = self.cache.get(key, fullpath)
+            if data is not None:
+                self.metrics.add("cache_hits")
+                return data
+            self.metrics.add("cache_misses")
+
+        if self.backend == "native":
+            data = self._parse(fullpath, name)
+        else:
+            data = self._run_inspector(fullpath, name)
+        if self.cache is not None:
+            self.cache.put(key, fullpath, data)
+        return data
+
+    def _parse(self, fullpath: str, name: str) -> dict:
+        start = time.perf_counter()
+        try:
+            return load_module(
+                fullpath, partial(_should_ignore, self.docstring_ignores)
+            )
+        # malformed .tf.json files raise ValueError, and undecodable or
+        # unreadable files ValueError and OSError
+        except (HCLError, ValueError, OSError) as e:
+            raise InspectError(f"could not parse {fullpath}: {e}") from e
+        finally:
+            self.metrics.add_module(
+                name, "parse_seconds", time.perf_counter() - start
+            )
+
+    def _run_inspector(self, fullpath: str, name: str) -> dict:
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(
+                ["terraform-config-inspect", "--json", fullpath],
+                capture_output=True,
+                timeout=self.inspect_timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            self.metrics.add("inspector_timeouts")
+            raise InspectError(
+                f"terraform-config-inspect timed out after {e.timeout}s"
+            ) from e
+        except OSError as e:
+            raise InspectError(f"could not run terraform-config-inspect: {e}") from e
+        if proc.returncode != 0:
+            stderr = proc.stderr.decode(errors="replace").strip()
+            raise InspectError(
+                f"terraform-config-inspect exited with {proc.returncode}: {stderr}"
+            )
+        output = proc.stdout
+        elapsed = time.perf_counter() - start
+        self.metrics.add("inspector_runs")
+        self.metrics.add("inspector_seconds", elapsed)
+        self.metrics.add("inspector_bytes", len(output))
+        self.metrics.add_module(name, "inspect_seconds", elapsed)
+
+        start = time.perf_counter()
+        try:
+            data = json.loads(output)
+        except ValueError as e:
+            raise InspectError(
+                f"invalid output from terraform-config-inspect: {e}"
+            ) from e
+        self.metrics.add_module(name, "parse_seconds", time.perf_counter() - start)
+        return data
 
     def create_objects(self, module: TerraformModule, data: dict):
         for kind, cls in TF_OBJ_MAP.items():
             for key, item in data[f"{kind}s"].items():
-                obj = cls(self.config, module, key, item)
+                obj = cls(module, key, item)
                 yield obj
 
     def dump(self) -> None:
@@ -1,21 +1,27 @@
-from typing import Any, cast, NamedTuple
+import difflib
+import time
+from typing import Any, cast, Iterable, Iterator, NamedTuple
 
 from docutils import nodes
 from docutils.nodes import Element
-from docutils.parsers.rst import directives
+from docutils.parsers.rst import Directive, directives
+from docutils.statemachine import StringList
 from sphinx import addnodes
 from sphinx.addnodes import desc_signature, pending_xref
 from sphinx.builders import Builder
 from sphinx.directives import ObjectDescription
-from sphinx.domains import Domain, ObjType
+from sphinx.domains import Domain, Index, IndexEntry, ObjType
 from sphinx.environment import BuildEnvironment
 from sphinx.locale import _
 from sphinx.roles import XRefRole
+from sphinx.util.docutils import SphinxDirective
 from sphinx.util.logging import getLogger
 from sphinx.util.nodes import make_id, make_refnode
 from sphinx.util.typing import OptionSpec
 
-from .store import TerraformModule, TerraformObjectBase
+from .metrics import Metrics
+from .render import SECTIONS
+from .store import TerraformModule, TerraformObjectBase, TerraformStore
 
 
 logger = getLogger(__name__)
@@ -29,6 +35,9 @@ class TerraformObjectDirective(ObjectDescription[tuple[str, str, str]]):
     }
 
     tfobj: TerraformModule | TerraformObjectBase | None = None
+    # set when the directive is run by tf:automodule, which builds the fields
+    # of the object from the store rather than parsing them from the content
+    auto: bool = False
 
     @property
     def display_name(self):
@@ -51,10 +60,58 @@ class TerraformObjectDirective(ObjectDescription[tuple[str, str, str]]):
     def get_signature_suffix(self, sig: str) -> list[nodes.Node]:
         return []
 
+    def get_fields(self) -> list[tuple[str, nodes.Element]]:
+        return []
+
+    def make_field(self, name: str, body: nodes.Element) -> nodes.field:
+        if isinstance(body, nodes.Inline):
+            body = nodes.paragraph("", "", body)
+        field = nodes.field(
+            "", nodes.field_name(name, name), nodes.field_body("", body)
+        )
+        self.set_source_info(field)
+        return field
+
+    def make_code_block(self, code: str) -> nodes.literal_block:
+        # the same node a `.. code-block::` without a language would produce
+        block = nodes.literal_block(code, code)
+        block["language"] = "default"
+        block["force"] = False
+        block["linenos"] = False
+        block["highlight_args"] = {}
+        self.set_source_info(block)
+        return block
+
+    def make_module_xref(self, name: str) -> pending_xref:
+        # the same node as :tf:module:`name`
+        xref = pending_xref(
+            "",
+            nodes.literal(name, name, classes=["xref", "tf", "tf-module"]),
+            refdomain="tf",
+            reftype="module",
+            reftarget=name,
+            refexplicit=False,
+            refwarn=True,
+            refdoc=self.env.docname,
+        )
+        self.set_source_info(xref)
+        return xref
+
+    def transform_content(self, contentnode: addnodes.desc_content) -> None:
+        if not self.auto:
+            return
+        fields = self.get_fields()
+        if fields:
+            contentnode.insert(
+                0, nodes.field_list("", *[self.make_field(*f) for f in fields])
+            )
+
     def handle_signature(
         self, sig: str, signode: desc_signature
     ) -> tuple[str, str, str]:
         self.get_tf_object(sig)
+        domain = cast(TerraformDomain, self.env.get_domain("tf"))
+        domain.note_module(self.module_name)
 
         signode += addnodes.desc_annotation(self.display_name, self.display_name)
         signode += addnodes.desc_sig_space()
@@ -77,7 +134,9 @@ class TerraformObjectDirective(ObjectDescription[tuple[str, str, str]]):
         self.state.document.note_explicit_target(signode)
 
         domain = cast(TerraformDomain, self.env.get_domain("tf"))
-        domain.note_object(fullname, objtype, node_id, signode)
+        domain.note_object(
+            fullname, objtype, node_id, signode, module=module_name, objname=objname
+        )
 
         if "noindexentry" not in self.options:
             indextext = self.get_index_text(module_name, objname)
@@ -102,6 +161,144 @@ class TerraformModuleDirective(TerraformObjectDirective):
         return f"{objname} ({self.objtype})"
 
 
+class AutoObjectsMixin:
+    """Documents objects of the store with their directives, rendering their
+    docstrings from the ``docstring`` block of the templates."""
+
+    def docstring_content(
+        self,
+        templates: list[str],
+        module: TerraformModule,
+        **context: Any,
+    ) -> StringList:
+        renderer = self.env.app.tfdoc_renderer
+        text = renderer.render_block(templates, "docstring", module=module, **context)
+        return StringList(text.splitlines(), source=module.path)
+
+    def run_object(
+        self, kind: str, module: TerraformModule, name: str, item: TerraformObjectBase
+    ) -> list[nodes.Node]:
+        content = self.docstring_content(
+            [f"{kind}.rst", "base.rst"],
+            module,
+            directive=kind,
+            name=name,
+            item=item,
+        )
+        # the members of a module documented with :noindex: are not indexed
+        # either, or they would clash with the page that indexes the module
+        options = {
+            key: value
+            for key, value in self.options.items()
+            if key in ("noindex", "noindexentry")
+        }
+        directive = TerraformDomain.directives[kind](
+            f"tf:{kind}",
+            [f"{module.name}.{name}"],
+            options,
+            content,
+            self.lineno,
+            self.content_offset,
+            self.block_text,
+            self.state,
+            self.state_machine,
+        )
+        directive.auto = True
+        return directive.run()
+
+
+class TerraformAutoModuleDirective(AutoObjectsMixin, TerraformModuleDirective):
+    """Documents a module and all of its objects.
+
+    The nodes are built straight from the store, so unlike the generated
+    pages nothing but the docstrings goes through docutils; those are still
+    rendered from the ``docstring`` block of the templates.  With
+    ``:no-members:``, only the module itself is documented, e.g. when its
+    objects are split across subpages with ``tf:automembers``.
+    """
+
+    option_spec: OptionSpec = {
+        **TerraformModuleDirective.option_spec,
+        "no-members": directives.flag,
+    }
+
+    sections = SECTIONS
+
+    def run(self) -> list[nodes.Node]:
+        # document the module itself as a tf:module
+        self.name = "tf:module"
+        module = self.env.tfdoc_store.modules.get(self.arguments[0])
+        if module is None:
+            logger.warning(
+                f"unknown module {self.arguments[0]}", location=self.get_location()
+            )
+            return []
+        self.content = self.docstring_content(["module.rst"], module) + self.content
+        return super().run()
+
+    def transform_content(self, contentnode: addnodes.desc_content) -> None:
+        module = self.tfobj
+        if "no-members" not in self.options:
+            for kind, title in self.sections:
+                children = getattr(module, f"{kind}s")
+                if not children:
+                    continue
+                section = self.make_section(title)
+                for name, item in children.items():
+                    section += self.run_object(kind, module, name, item)
+                contentnode += section
+
+        if module.used_by:
+            section = self.make_section("Used By")
+            items = [
+                nodes.list_item(
+                    "", nodes.paragraph("", "", self.make_module_xref(caller.name))
+                )
+                for caller in module.used_by
+            ]
+            section += nodes.bullet_list("", *items, bullet="*")
+            contentnode += section
+
+    def make_section(self, title: str) -> nodes.section:
+        section = nodes.section()
+        section += nodes.title(title, title)
+        section["names"].append(nodes.fully_normalize_name(title))
+        self.state.document.note_implicit_target(section, section)
+        self.set_source_info(section)
+        return section
+
+
+class TerraformAutoMembersDirective(AutoObjectsMixin, SphinxDirective):
+    """Documents the objects of one kind of a module, or the slice of them from
+    ``:start:`` to ``:stop:``, without documenting the module itself."""
+
+    required_arguments = 1
+    option_spec: OptionSpec = {
+        "kind": lambda x: directives.choice(x, [kind for kind, _ in SECTIONS]),
+        "start": directives.nonnegative_int,
+        "stop": directives.nonnegative_int,
+    }
+
+    def run(self) -> list[nodes.Node]:
+        module = self.env.tfdoc_store.modules.get(self.arguments[0])
+        if module is None:
+            logger.warning(
+                f"unknown module {self.arguments[0]}", location=self.get_location()
+            )
+            return []
+        if "kind" in self.options:
+            kinds = [self.options["kind"]]
+        else:
+            kinds = [kind for kind, _ in SECTIONS]
+        result: list[nodes.Node] = []
+        for kind in kinds:
+            items = list(getattr(module, f"{kind}s").items())
+            items = items[self.options.get("start", 0) : self.options.get("stop")]
+            for name, item in items:
+                result.extend(self.run_object(kind, module, name, item))
+        return result
+
+
 class TerraformManagedResourceDirective(TerraformObjectDirective):
     display_name = "resource"
 
@@ -121,10 +318,25 @@ class TerraformDataResourceDirective(TerraformManagedResourceDirective):
 class TerraformRequiredProviderDirective(TerraformObjectDirective):
     display_name = "required provider"
 
+    def get_fields(self) -> list[tuple[str, nodes.Element]]:
+        fields = []
+        if self.tfobj.source:
+            fields.append(("Source", nodes.literal(text=self.tfobj.source)))
+        if self.tfobj.version_constraints:
+            fields.append(
+                ("Version", nodes.literal(text=self.tfobj.version_constraints))
+            )
+        return fields
+
 
 class TerraformModuleCallDirective(TerraformObjectDirective):
     display_name = "called module"
 
+    def get_fields(self) -> list[tuple[str, nodes.Element]]:
+        if self.tfobj.target is not None:
+            return [("Source", self.make_module_xref(self.tfobj.source))]
+        return [("Source", nodes.literal(text=self.tfobj.source))]
+
 
 class TerraformVariableDirective(TerraformObjectDirective):
     def get_signature_suffix(self, sig: str) -> list[nodes.Node]:
@@ -133,34 +345,241 @@ class TerraformVariableDirective(TerraformObjectDirective):
         else:
             return addnodes.desc_optional("required", "required")
 
+    def get_fields(self) -> list[tuple[str, nodes.Element]]:
+        fields = [("Type", self.make_code_block(self.tfobj.type))]
+        if self.tfobj.default != "null":
+            fields.append(("Default", self.make_code_block(self.tfobj.default)))
+        return fields
+
 
 class TerraformOutputDirective(TerraformObjectDirective):
     pass
 
 
 class TerraformXRefRole(XRefRole):
-    pass
+    def __init__(self, **kwargs: Any):
+        # unresolved references are reported by TerraformDomain.warn_unresolved
+        kwargs.setdefault("warn_dangling", True)
+        super().__init__(**kwargs)
 
 
 class ObjectEntry(NamedTuple):
     docname: str
     node_id: str
     objtype: str
+    module: str = ""
+    name: str = ""
+
+    @property
+    def role(self) -> str:
+        return self.objtype.replace(" ", "_")
+
+
+# the most modules a misspelled module name is compared with
+MAX_SUGGESTION_POOL = 200
+
+
+class XRefIndex:
+    """Lookup tables over the domain's objects, built once per resolve phase."""
+
+    def __init__(self, objects: dict[str, ObjectEntry]):
+        # (module, role, name) -> object
+        self.objects: dict[tuple[str, str, str], ObjectEntry] = {}
+        # module -> role -> names
+        self.by_module: dict[str, dict[str, list[str]]] = {}
+        # name -> (module, role) of every object with that name
+        self.by_name: dict[str, list[tuple[str, str]]] = {}
+        # directory -> the modules in it, so that the modules close to a
+        # misspelled one are only looked for in the closest directories
+        self.by_dir: dict[str, list[str]] = {}
+        # (module, role, name) -> candidates, as the same dangling reference
+        # tends to appear on many pages
+        self.suggestions: dict[tuple[str, str, str], list[str]] = {}
+        for obj in objects.values():
+            self.objects[(obj.module, obj.role, obj.name)] = obj
+            roles = self.by_module.setdefault(obj.module, {})
+            if not roles:
+                self.by_dir.setdefault(obj.module.rpartition("/")[0], []).append(
+                    obj.module
+                )
+            roles.setdefault(obj.role, []).append(obj.name)
+            self.by_name.setdefault(obj.name, []).append((obj.module, obj.role))
+
+    def candidates(self, module: str, role: str, name: str, n: int = 3) -> list[str]:
+        """The closest targets to a target that could not be resolved."""
+        key = (module, role, name)
+        if key not in self.suggestions:
+            self.suggestions[key] = self._candidates(module, role, name, n)
+        return self.suggestions[key]
+
+    def _candidates(self, module: str, role: str, name: str, n: int) -> list[str]:
+        if module not in self.by_module:
+            close = self.close_modules(module, n)
+            if role == "module":
+                return close
+            return [
+                f"{m}.{name}" for m in close if name in self.by_module[m].get(role, ())
+            ]
+        # the same name in another module, then similar names in this module
+        result = [
+            f"{m}.{name}"
+            for m, r in self.by_name.get(name, ())
+            if r == role and m != module
+        ]
+        names = self.by_module[module].get(role, [])
+        result += [f"{module}.{x}" for x in difflib.get_close_matches(name, names, n)]
+        return result[:n]
+
+    def close_modules(self, module: str, n: int) -> list[str]:
+        """The modules closest to ``module``, from its own directory or, when
+        that does not exist, from the directory closest to it."""
+        directory = module.rpartition("/")[0]
+        if directory not in self.by_dir:
+            close = difflib.get_close_matches(directory, self.by_dir, 1)
+            if not close:
+                return []
+            directory = close[0]
+        pool = self.by_dir[directory]
+        if len(pool) > MAX_SUGGESTION_POOL:
+            # e.g. a flat repository: only the names of about the same length
+            pool = sorted(pool, key=lambda m: abs(len(m) - len(module)))
+            pool = pool[:MAX_SUGGESTION_POOL]
+        return difflib.get_close_matches(module, pool, n)
+
+
+# object type of the objects referenced by each role
+ROLE_TYPES = {
+    "data": "data_resource",
+    "resource": "managed_resource",
+    "module": "module",
+    "called_module": "module_call",
+    "output": "output",
+    "required_provider": "required_provider",
+    "variable": "variable",
+}
+
+
+class TerraformIndex(Index):
+    """An index built from the inverse indexes of the store, linking to the
+    objects documented in this build."""
+
+    def lookup(self, module: str, role: str, name: str) -> ObjectEntry | None:
+        domain = cast(TerraformDomain, self.domain)
+        return domain.xref_index.objects.get((module, role, name))
+
+    def entry(
+        self, name: str, subtype: int, obj: ObjectEntry, extra: str = ""
+    ) -> IndexEntry:
+        return IndexEntry(name, subtype, obj.docname, obj.node_id, extra, "", "")
+
+    def generate(
+        self, docnames: Iterable[str] | None = None
+    ) -> tuple[list[tuple[str, list[IndexEntry]]], bool]:
+        store = getattr(self.domain.env, "tfdoc_store", None)
+        if store is None or not store.complete:
+            return [], False
+        content = self.entries(store, set(docnames) if docnames else None)
+        return sorted((k, v) for k, v in content.items() if v), True
+
+    def entries(
+        self, store: TerraformStore, docnames: set[str] | None
+    ) -> dict[str, list[IndexEntry]]:
+        raise NotImplementedError
+
+
+class TerraformCallersIndex(TerraformIndex):
+    """The modules called from other modules, with their callers."""
+
+    name = "callers"
+    localname = _("Terraform Module Callers")
+    shortname = _("callers")
+
+    def entries(
+        self, store: TerraformStore, docnames: set[str] | None
+    ) -> dict[str, list[IndexEntry]]:
+        content: dict[str, list[IndexEntry]] = {}
+        for name in sorted(store.callers):
+            obj = self.lookup(name, "module", name)
+            if obj is None or (docnames is not None and obj.docname not in docnames):
+                continue
+            callers = [
+                (caller, self.lookup(caller, "module", caller))
+                for caller in sorted(store.callers[name])
+            ]
+            callers = [(caller, x) for caller, x in callers if x is not None]
+            if not callers:
+                continue
+            entries = content.setdefault(name[0].upper(), [])
+            entries.append(self.entry(name, 1, obj))
+            entries.extend(self.entry(caller, 2, x) for caller, x in callers)
+        return content
+
+
+class TerraformProvidersIndex(TerraformIndex):
+    """The modules using every provider."""
+
+    name = "providers"
+    localname = _("Terraform Providers")
+    shortname = _("providers")
+
+    def entries(
+        self, store: TerraformStore, docnames: set[str] | None
+    ) -> dict[str, list[IndexEntry]]:
+        content: dict[str, list[IndexEntry]] = {}
+        for provider, names in store.providers.items():
+            entries = content.setdefault(provider, [])
+            for name in sorted(names):
+                obj = self.lookup(name, "module", name)
+                if obj is not None and (docnames is None or obj.docname in docnames):
+                    entries.append(self.entry(name, 0, obj))
+        return content
+
+
+class TerraformResourceTypesIndex(TerraformIndex):
+    """The managed and data resources of every resource type."""
+
+    name = "resources"
+    localname = _("Terraform Resource Types")
+    shortname = _("resource types")
+
+    def entries(
+        self, store: TerraformStore, docnames: set[str] | None
+    ) -> dict[str, list[IndexEntry]]:
+        content: dict[str, list[IndexEntry]] = {}
+        for resource_type in store.resource_types:
+            entries = content.setdefault(resource_type, [])
+            for resource in store.resources_of_type(resource_type):
+                module = resource.module.name
+                if resource.kind == "data_resource":
+                    obj = self.lookup(module, "data", resource.name)
+                    extra = "data"
+                else:
+                    obj = self.lookup(module, "resource", resource.name)
+                    extra = ""
+                if obj is not None and (docnames is None or obj.docname in docnames):
+                    name = f"{module}.{resource.name}"
+                    entries.append(self.entry(name, 0, obj, extra))
+        return content
 
 
 class TerraformDomain(Domain):
     name: str = "tf"
     label: str = "Terraform"
+    # object type -> its label and the roles referencing it, which is how
+    # intersphinx finds the entries of an inventory for a role
     object_types: dict[str, ObjType] = {
-        "data_resource": ObjType(_("data_resource"), "data_resource"),
-        "managed_resource": ObjType(_("managed_resource"), "managed_resource"),
-        "module_call": ObjType(_("module_call"), "module_call"),
+        "data_resource": ObjType(_("data"), "data"),
+        "managed_resource": ObjType(_("resource"), "resource"),
+        "module": ObjType(_("module"), "module"),
+        "module_call": ObjType(_("called module"), "called_module"),
         "output": ObjType(_("output"), "output"),
-        "required_provider": ObjType(_("required_provider"), "required_provider"),
+        "required_provider": ObjType(_("required provider"), "required_provider"),
         "variable": ObjType(_("variable"), "variable"),
     }
-    directives: dict[str, type[TerraformObjectDirective]] = {
+    directives: dict[str, type[Directive]] = {
         "module": TerraformModuleDirective,
+        "automodule": TerraformAutoModuleDirective,
+        "automembers": TerraformAutoMembersDirective,
         "data_resource": TerraformDataResourceDirective,
         "managed_resource": TerraformManagedResourceDirective,
         "module_call": TerraformModuleCallDirective,
@@ -177,20 +596,86 @@ class TerraformDomain(Domain):
         "called_module": TerraformXRefRole(),
         "module": TerraformXRefRole(),
     }
-    indicies: dict[str, Any] = {}
-    initial_data: dict[str, dict[str, tuple[Any]]] = {
+    indices: list[type[Index]] = [
+        TerraformCallersIndex,
+        TerraformProvidersIndex,
+        TerraformResourceTypesIndex,
+    ]
+    data_version = 2
+    initial_data: dict[str, dict[str, Any]] = {
         "objects": {},
         "modules": {},
     }
 
     @property
     def objects(self) -> dict[str, ObjectEntry]:
-        return self.data.setdefault("object", {})
+        return self.data.setdefault("objects", {})
+
+    @property
+    def modules(self) -> dict[str, set[str]]:
+        # module name -> documents describing the module or its objects
+        return self.data.setdefault("modules", {})
+
+    def note_module(self, name: str) -> None:
+        self.modules.setdefault(name, set()).add(self.env.docname)
+
+    @property
+    def xref_index(self) -> XRefIndex:
+        index = getattr(self, "_xref_index", None)
+        if index is None:
+            index = self._xref_index = XRefIndex(self.objects)
+        return index
 
-    def note_object(self, name: str, objtype: str, node_id: str, location: Any = None):
+    def _changed(self) -> None:
+        self._xref_index = None
+
+    @property
+    def metrics(self) -> Metrics:
+        # resolution is timed into the metrics of the store built for this run
+        store = getattr(self.env, "tfdoc_store", None)
+        if store is None:
+            return Metrics()
+        return store.metrics
+
+    def note_object(
+        self,
+        name: str,
+        objtype: str,
+        node_id: str,
+        location: Any = None,
+        module: str = "",
+        objname: str = "",
+    ):
         if name in self.objects:
             logger.warning(f"duplicate object description of {name}")
-        self.objects[name] = ObjectEntry(self.env.docname, node_id, objtype)
+        self.objects[name] = ObjectEntry(
+            self.env.docname, node_id, objtype, module, objname
+        )
+        self._changed()
+
+    def clear_doc(self, docname: str) -> None:
+        self._changed()
+        for name, obj in list(self.objects.items()):
+            if obj.docname == docname:
+                del self.objects[name]
+        for name, docnames in list(self.modules.items()):
+            docnames.discard(docname)
+            if not docnames:
+                del self.modules[name]
+
+    def merge_domaindata(self, docnames: list[str], otherdata: dict[str, Any]) -> None:
+        # objects noted by a parallel reader, only for the documents it read
+        self._changed()
+        for name, obj in otherdata["objects"].items():
+            if obj.docname not in docnames:
+                continue
+            if name in self.objects and self.objects[name].docname != obj.docname:
+                logger.warning(f"duplicate object description of {name}")
+            self.objects[name] = obj
+        for name, others in otherdata["modules"].items():
+            others = others & set(docnames)
+            if others:
+                self.modules.setdefault(name, set()).update(others)
 
     def resolve_xref(
         self,
@@ -202,18 +687,79 @@ class TerraformDomain(Domain):
         node: pending_xref,
         contnode: Element,
     ) -> Element | None:
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            found = self._find(type, target)
+            if found is not None:
+                metrics.add("xrefs_resolved")
+                obj, title = found
+                return make_refnode(
+                    builder, fromdocname, obj.docname, obj.node_id, contnode, title
+                )
+
+            # left to the missing-reference event, e.g. for intersphinx; see
+            # warn_unresolved
+            return None
+        finally:
+            metrics.add_phase("resolve", time.perf_counter() - start)
+
+    def warn_unresolved(self, node: pending_xref) -> None:
+        """Warns about a reference that neither the domain nor any handler of
+        the missing-reference event could resolve."""
+        type, target = node["reftype"], node["reftarget"]
+        module, name = self._split(type, target)
+        fullname = ".".join([module, type, name])
+        self.metrics.add("xrefs_unresolved")
+        self.metrics.note_unresolved(fullname)
+        message = f"could not resolve {fullname}"
+        candidates = self.xref_index.candidates(module, type, name)
+        if candidates:
+            message += f" (did you mean {', '.join(candidates)}?)"
+        logger.warning(message, location=node)
+
+    def resolve_any_xref(
+        self,
+        env: BuildEnvironment,
+        fromdocname: str,
+        builder: Builder,
+        target: str,
+        node: pending_xref,
+        contnode: Element,
+    ) -> list[tuple[str, Element]]:
+        results = []
+        for role in self.roles:
+            found = self._find(role, target)
+            if found is not None:
+                obj, title = found
+                refnode = make_refnode(
+                    builder, fromdocname, obj.docname, obj.node_id, contnode, title
+                )
+                results.append((f"{self.name}:{role}", refnode))
+        return results
+
+    def get_objects(self) -> Iterator[tuple[str, str, str, str, str, int]]:
+        # the names are the targets of the roles, so that intersphinx finds
+        # them as they are written
+        for obj in self.objects.values():
+            if obj.role == "module":
+                name = obj.module
+            else:
+                name = f"{obj.module}.{obj.name}"
+            yield name, name, ROLE_TYPES[obj.role], obj.docname, obj.node_id, 1
+
+    def _split(self, type: str, target: str) -> tuple[str, str]:
         if type == "module":
-            fullname = ".".join([target, type, target])
-            title = ".".join([type, target])
-        else:
-            module, name = target.split(".")
-            fullname = ".".join([module, type, name])
-            title = fullname
-        if fullname in self.objects:
-            obj = self.objects[fullname]
-            return make_refnode(
-                builder, fromdocname, obj.docname, obj.node_id, contnode, title
-            )
-        else:
-            names = "\n".join(list(self.objects.keys()))
-            logger.warning(f"could not resolve {fullname} among {names}")
+            return target, target
+        # module names are paths and may contain dots, object names may not
+        module, _, name = target.rpartition(".")
+        return module, name
+
+    def _find(self, type: str, target: str) -> tuple[ObjectEntry, str] | None:
+        module, name = self._split(type, target)
+        obj = self.xref_index.objects.get((module, type, name))
+        if obj is None:
+            return None
+        if type == "module":
+            return obj, ".".join([type, target])
+        return obj, ".".join([module, type, name])
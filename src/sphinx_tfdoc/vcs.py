@@ -0,0 +1,45 @@
+import os
+import subprocess
+
+from sphinx.errors import ExtensionError
+
+
+def _git(cwd: str, *args: str) -> str:
+    try:
+        proc = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError:
+        raise ExtensionError("git not found")
+    except subprocess.CalledProcessError as e:
+        raise ExtensionError(f"git {' '.join(args)} failed: {e.stderr.strip()}")
+    return proc.stdout
+
+
+def changed_files(ref: str, dirs: list[str]) -> set[str]:
+    """Returns the absolute paths of the files below ``dirs`` that differ
+    between ``ref`` and the working tree, including deleted and untracked
+    files."""
+    toplevels = set()
+    for d in dirs:
+        toplevels.add(_git(d, "rev-parse", "--show-toplevel").strip())
+
+    paths = set()
+    for toplevel in sorted(toplevels):
+        # without --no-renames, only the new name of a moved file is listed
+        diff = _git(toplevel, "diff", "-z", "--name-only", "--no-renames", ref, "--")
+        untracked = _git(toplevel, "ls-files", "-z", "--others", "--exclude-standard")
+        for name in (diff + untracked).split("\0"):
+            if name:
+                paths.add(os.path.join(toplevel, name))
+
+    # git reports paths below the real path of the repository, while the
+    # store knows the directories as configured
+    changed = set()
+    for d in dirs:
+        real = os.path.realpath(d)
+        for path in paths:
+            path = os.path.realpath(path)
+            if path.startswith(real + os.sep):
+                changed.add(os.path.join(d, os.path.relpath(path, real)))
+    return changed
@@ -0,0 +1,251 @@
+"""Rebuilds the documentation whenever a Terraform file or a document changes.
+
+The builds run in this process, one after the other, and share a
+:class:`WatchSession`: the store loaded by the first build stays in memory and
+every following build only reloads the module directories that the watcher
+reported, instead of walking and fingerprinting the whole repository.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Iterable
+
+from sphinx.cmd.build import build_main
+from sphinx.util.console import darkgreen, bold
+from sphinx.util.logging import getLogger
+
+from .store import TerraformStore
+
+
+logger = getLogger(__name__)
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_ATTRIB
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+EVENT = struct.Struct("iIII")
+
+
+class WatchSession:
+    """State shared by the builds of a watch, see :func:`current`.
+
+    ``changes`` holds the paths that changed since the last build, or None
+    when they are unknown and the next build must load the store again.
+    """
+
+    def __init__(self):
+        self.store: TerraformStore | None = None
+        self.dirs: list[str] = []
+        self.target_dir: str | None = None
+        self.changes: set[str] | None = None
+
+    def reset(self) -> None:
+        self.changes = None
+
+
+_session: WatchSession | None = None
+
+
+def current() -> WatchSession | None:
+    """Returns the session of the watch running the current build, if any."""
+    return _session
+
+
+def _walk_dirs(path: str, ignore: Callable[[str], bool]) -> Iterable[str]:
+    pending = [path]
+    while pending:
+        directory = pending.pop()
+        yield directory
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and not ignore(entry.path):
+                        pending.append(entry.path)
+        except OSError:
+            continue
+
+
+class PollingWatcher:
+    """Finds changes by comparing the size and mtime of every file."""
+
+    def __init__(
+        self, paths: list[str], ignore: Callable[[str], bool], interval: float = 0.5
+    ):
+        self.paths = paths
+        self.ignore = ignore
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            for directory in _walk_dirs(path, self.ignore):
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            if entry.is_file() and not self.ignore(entry.path):
+                                st = entry.stat()
+                                snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+        return snapshot
+
+    def wait(self) -> set[str] | None:
+        while True:
+            time.sleep(self.interval)
+            snapshot = self.scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Finds changes with inotify, watching every directory below ``paths``."""
+
+    def __init__(
+        self, paths: list[str], ignore: Callable[[str], bool], settle: float = 0.05
+    ):
+        self.ignore = ignore
+        self.settle = settle
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: dict[int, str] = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        for directory in _walk_dirs(path, self.ignore):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd < 0:
+                # e.g. fs.inotify.max_user_watches was reached
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self.watches[wd] = directory
+
+    def read(self) -> set[str] | None:
+        changed: set[str] | None = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = EVENT.unpack_from(buf, offset)
+                offset += EVENT.size
+                name = os.fsdecode(buf[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # events were dropped, so the changes are unknown
+                    changed = None
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, name) if name else directory
+                if self.ignore(path):
+                    continue
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add(path)
+                if changed is not None:
+                    changed.add(path)
+
+    def wait(self) -> set[str] | None:
+        select.select([self.fd], [], [])
+        changed = self.read()
+        # editors save in several steps; wait until the burst of events is over
+        while select.select([self.fd], [], [], self.settle)[0]:
+            more = self.read()
+            changed = None if changed is None or more is None else changed | more
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def make_watcher(paths: list[str], ignore: Callable[[str], bool], poll: bool = False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths, ignore)
+        except (OSError, AttributeError) as e:
+            # polling still works, so this must not fail a build run with -W
+            logger.info(
+                bold("[tfdoc] inotify unavailable ") + f"({e}), polling instead"
+            )
+    return PollingWatcher(paths, ignore)
+
+
+def watch(
+    sourcedir: str, outdir: str, sphinx_args: list[str], poll: bool = False
+) -> int:
+    """Builds the documentation, then rebuilds it on every change."""
+    global _session
+    _session = session = WatchSession()
+    sourcedir = os.path.abspath(sourcedir)
+    outdir = os.path.abspath(outdir)
+    argv = [*sphinx_args, sourcedir, outdir]
+
+    status = build_main(argv)
+    # the first build told the session which directories hold the modules
+    paths = [sourcedir] + [d for d in session.dirs if d != sourcedir]
+    skip = [outdir] + ([session.target_dir] if session.target_dir else [])
+
+    def ignore(path: str) -> bool:
+        if os.path.basename(path).startswith("."):
+            return True
+        return any(path == d or path.startswith(d + os.sep) for d in skip)
+
+    watcher = make_watcher(paths, ignore, poll)
+    # Sphinx set up the logging during the first build, so these messages
+    # honour -q and the colour settings like the build output
+    logger.info(bold("[tfdoc] watching ") + darkgreen(", ".join(paths)))
+    try:
+        while True:
+            changed = watcher.wait()
+            if changed is None or os.path.join(sourcedir, "conf.py") in changed:
+                session.reset()
+            elif session.changes is not None:
+                session.changes |= changed
+            start = time.perf_counter()
+            status = build_main(argv)
+            logger.info(
+                bold("[tfdoc] rebuilt ") + f"in {time.perf_counter() - start:.2f}s"
+            )
+    except KeyboardInterrupt:
+        return status
+    finally:
+        watcher.close()
+        _session = None
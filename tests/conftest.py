@@ -0,0 +1,11 @@
+import pytest
+from sphinx.testing.path import path
+
+
+pytest_plugins = "sphinx.testing.fixtures"
+
+
+@pytest.fixture(scope="session")
+def rootdir() -> path:
+    # the projects built by the tests, see `pytest.mark.sphinx(testroot=...)`
+    return path(__file__).parent.abspath() / "roots"
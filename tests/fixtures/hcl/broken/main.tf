@@ -0,0 +1,5 @@
+variable "ok" {}
+
+variable "bad" {
+  default =
+}
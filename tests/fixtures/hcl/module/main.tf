@@ -0,0 +1,41 @@
+# The bucket module.
+
+terraform {
+  required_version = ">= 1.3"
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 5.0"
+    }
+    random = "~> 3.0"
+  }
+}
+
+provider "google" {
+  version = "4.0"
+}
+
+# The bucket.
+resource "aws_s3_bucket" "this" {
+  provider = aws.east
+  bucket   = "${var.name}-bucket"
+}
+
+data "aws_iam_policy_document" "this" {}
+
+# Networking.
+module "vpc" {
+  source = "../vpc"
+}
+
+module "registry" {
+  source  = "terraform-aws-modules/vpc/aws"
+  version = "5.0.0"
+}
+
+output "arn" {
+  description = <<EOT
+The ARN of the bucket.
+EOT
+  value       = aws_s3_bucket.this.arn
+}
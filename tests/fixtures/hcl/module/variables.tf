@@ -0,0 +1,24 @@
+# The name of the bucket.
+# tflint-ignore: terraform_unused_declarations
+variable "name" {
+  type        = string
+  description = "Name of the ${var.prefix} bucket"
+}
+
+variable "tags" {
+  type = map(object({
+    owner = string
+    team  = optional(string)
+  }))
+  default = {
+    env = "dev"
+  }
+}
+
+variable "policy" {
+  default = <<-EOT
+    {
+      "Version": "2012-10-17"
+    }
+  EOT
+}
@@ -0,0 +1,8 @@
+import os
+
+extensions = ["sphinx_tfdoc"]
+exclude_patterns = ["_build"]
+
+tfdoc_dirs = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "terraform")]
+tfdoc_backend = "native"
+tfdoc_module_docstring_files = ["main.tf"]
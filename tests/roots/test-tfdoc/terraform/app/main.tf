@@ -0,0 +1,11 @@
+# The application.
+
+# The network of the application.
+module "vpc" {
+  source = "../net/vpc"
+}
+
+# Where the application keeps its data.
+resource "aws_s3_bucket" "data" {
+  bucket = "app-data"
+}
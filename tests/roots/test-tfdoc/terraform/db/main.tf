@@ -0,0 +1,10 @@
+# The database.
+
+# Name of the database.
+variable "name" {
+  type = string
+}
+
+resource "aws_db_instance" "this" {
+  db_name = var.name
+}
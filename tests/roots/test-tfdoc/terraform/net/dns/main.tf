@@ -0,0 +1,6 @@
+# The DNS zone.
+
+# Name of the zone.
+variable "zone" {
+  type = string
+}
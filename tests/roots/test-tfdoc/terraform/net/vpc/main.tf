@@ -0,0 +1,16 @@
+# The VPC.
+
+# The CIDR block.
+variable "cidr" {
+  type    = string
+  default = "10.0.0.0/16"
+}
+
+resource "aws_vpc" "this" {
+  cidr_block = var.cidr
+}
+
+# The VPC id.
+output "id" {
+  value = aws_vpc.this.id
+}
@@ -0,0 +1,261 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+from sphinx.util.parallel import parallel_available
+
+from sphinx_tfdoc.shard import generate, merge
+
+
+# the pages generated for the modules of the test project
+MODULE_PAGES = {
+    "app/index.rst",
+    "db/index.rst",
+    "net/dns/index.rst",
+    "net/vpc/index.rst",
+}
+
+
+def build(make_app, srcdir, parallel=0, **confoverrides):
+    """Builds ``srcdir`` on top of the environment of its previous build,
+    returning the application and the documents it read."""
+    app = make_app(
+        "html", srcdir=srcdir, parallel=parallel, confoverrides=confoverrides
+    )
+    read: list[str] = []
+    app.connect("env-before-read-docs", lambda app, env, docnames: read.extend(docnames))
+    app.build()
+    return app, sorted(read)
+
+
+def pages(srcdir) -> dict[str, int]:
+    """The generated pages, relative to the target directory, and their
+    modification times."""
+    target = os.path.join(srcdir, "tfdoc")
+    result = {}
+    for dirpath, _, filenames in os.walk(target):
+        for filename in filenames:
+            if filename.endswith(".rst"):
+                page = os.path.join(dirpath, filename)
+                result[os.path.relpath(page, target)] = os.stat(page).st_mtime_ns
+    return result
+
+
+def rewritten(before: dict[str, int], after: dict[str, int]) -> list[str]:
+    return sorted(page for page in after if before.get(page) != after[page])
+
+
+def edit(srcdir, module: str, old: str, new: str) -> None:
+    filename = os.path.join(srcdir, "terraform", module, "main.tf")
+    with open(filename) as f:
+        content = f.read()
+    assert old in content
+    with open(filename, "w") as f:
+        f.write(content.replace(old, new))
+
+
+def read_page(srcdir, page: str) -> str:
+    with open(os.path.join(srcdir, "tfdoc", page)) as f:
+        return f.read()
+
+
+@pytest.mark.sphinx("html", testroot="tfdoc", srcdir="tfdoc-reuse")
+def test_unchanged(app, make_app):
+    app.build()
+    assert set(pages(app.srcdir)) >= MODULE_PAGES
+    before = pages(app.srcdir)
+
+    app, read = build(make_app, app.srcdir)
+    store = app.env.tfdoc_store
+    assert store.metrics.counters["modules_reused"] == 4
+    assert store.outdated == set()
+    assert read == []
+    assert rewritten(before, pages(app.srcdir)) == []
+
+
+@pytest.mark.sphinx("html", testroot="tfdoc", srcdir="tfdoc-changed")
+def test_changed_module(app, make_app):
+    app.build()
+    before = pages(app.srcdir)
+    edit(app.srcdir, "net/vpc", "# The CIDR block.", "# The CIDR block of the VPC.")
+
+    app, read = build(make_app, app.srcdir)
+    store = app.env.tfdoc_store
+    assert store.changed == {"net/vpc"}
+    assert store.metrics.counters["modules_reused"] == 3
+    # its caller is unaffected, while the hand-written page documenting the
+    # module is read again
+    assert store.outdated == {"net/vpc"}
+    assert read == ["manual", "tfdoc/net/vpc/index"]
+    assert rewritten(before, pages(app.srcdir)) == ["net/vpc/index.rst"]
+    assert "The CIDR block of the VPC." in read_page(app.srcdir, "net/vpc/index.rst")
+
+
+@pytest.mark.sphinx("html", testroot="tfdoc", srcdir="tfdoc-calls")
+def test_removed_call(app, make_app):
+    app.build()
+    assert "app" in read_page(app.srcdir, "net/vpc/index.rst")
+    before = pages(app.srcdir)
+    edit(app.srcdir, "app", 'source = "../net/vpc"', 'source = "registry/vpc"')
+
+    app, read = build(make_app, app.srcdir)
+    store = app.env.tfdoc_store
+    assert store.changed == {"app"}
+    # the module it stopped calling no longer lists it as a user
+    assert store.outdated == {"app", "net/vpc"}
+    assert read == ["manual", "tfdoc/app/index", "tfdoc/net/vpc/index"]
+    assert rewritten(before, pages(app.srcdir)) == [
+        "app/index.rst",
+        "net/vpc/index.rst",
+    ]
+    assert store.callers_of("net/vpc") == []
+
+
+@pytest.mark.sphinx("html", testroot="tfdoc", srcdir="tfdoc-added")
+def test_added_module(app, make_app):
+    app.build()
+    before = pages(app.srcdir)
+    os.makedirs(os.path.join(app.srcdir, "terraform", "web"))
+    with open(os.path.join(app.srcdir, "terraform", "web", "main.tf"), "w") as f:
+        f.write('module "dns" {\n  source = "../net/dns"\n}\n')
+
+    app, read = build(make_app, app.srcdir)
+    store = app.env.tfdoc_store
+    assert store.added == {"web"}
+    assert store.outdated == {"web", "net/dns"}
+    # the index lists the new page
+    assert read == ["tfdoc/index", "tfdoc/net/dns/index", "tfdoc/web/index"]
+    assert rewritten(before, pages(app.srcdir)) == [
+        "index.rst",
+        "net/dns/index.rst",
+        "web/index.rst",
+    ]
+
+
+def domain_data(app) -> tuple[dict, dict]:
+    domain = app.env.get_domain("tf")
+    return dict(domain.objects), {k: set(v) for k, v in domain.modules.items()}
+
+
+@pytest.mark.skipif(not parallel_available, reason="needs parallel reads")
+def test_parallel_read(rootdir, sphinx_test_tempdir, make_app):
+    serial = sphinx_test_tempdir / "tfdoc-serial"
+    parallel = sphinx_test_tempdir / "tfdoc-parallel"
+    (rootdir / "test-tfdoc").copytree(serial)
+    (rootdir / "test-tfdoc").copytree(parallel)
+
+    expected, _ = build(make_app, serial)
+    app = make_app("html", srcdir=parallel, parallel=2)
+    merged = []
+    app.connect("env-merge-info", lambda app, env, docnames, other: merged.append(1))
+    app.build()
+    assert merged
+    # the objects noted by the readers are merged for the documents they read
+    assert domain_data(app) == domain_data(expected)
+    assert domain_data(app)[1]["net/vpc"] == {"manual", "tfdoc/net/vpc/index"}
+
+
+@pytest.mark.skipif(not parallel_available, reason="needs parallel reads")
+@pytest.mark.sphinx(
+    "html",
+    testroot="tfdoc",
+    srcdir="tfdoc-lazy",
+    parallel=2,
+    confoverrides={"tfdoc_lazy": True},
+)
+def test_parallel_lazy_read(app, make_app):
+    app.build()
+    # the modules the readers loaded are handed back with their domain data
+    store = app.env.tfdoc_store
+    assert store.lazy
+    assert all(module.loaded for module in store.modules.values())
+    assert store.metrics.counters["modules_loaded_lazily"] == 4
+
+    app, read = build(make_app, app.srcdir, parallel=2, tfdoc_lazy=True)
+    assert read == []
+    assert all(module.loaded for module in app.env.tfdoc_store.modules.values())
+
+
+def snapshot(srcdir) -> dict[str, str]:
+    """The files in the target directory and their contents."""
+    target = os.path.join(srcdir, "tfdoc")
+    result = {}
+    for dirpath, _, filenames in os.walk(target):
+        for filename in filenames:
+            page = os.path.join(dirpath, filename)
+            with open(page) as f:
+                result[os.path.relpath(page, target)] = f.read()
+    return result
+
+
+def generate_shards(srcdir, store_file: str, count: int) -> None:
+    fragments = []
+    for index in range(count):
+        fragment = os.path.join(srcdir, f"shard-{index}.pickle")
+        generate(srcdir, fragment, shard=(index, count))
+        fragments.append(fragment)
+    merge(srcdir, fragments, store_file=store_file)
+
+
+def test_shards(rootdir, sphinx_test_tempdir, make_app):
+    srcdir = sphinx_test_tempdir / "tfdoc-shards"
+    (rootdir / "test-tfdoc").copytree(srcdir)
+    store_file = os.path.join(srcdir, "tfdoc.pickle")
+
+    generate_shards(srcdir, store_file, 1)
+    expected = snapshot(srcdir)
+    shutil.rmtree(os.path.join(srcdir, "tfdoc"))
+    generate_shards(srcdir, store_file, 3)
+    assert snapshot(srcdir) == expected
+
+    app, _ = build(make_app, srcdir, tfdoc_store_file="tfdoc.pickle")
+    store = app.env.tfdoc_store
+    assert list(store.modules) == ["app", "db", "net/dns", "net/vpc"]
+    assert store.callers_of("net/vpc") == [store.modules["app"]]
+    assert app._warning.getvalue() == ""
+
+    # the next merged store is compared to the one of the previous build
+    edit(srcdir, "net/vpc", "# The CIDR block.", "# The CIDR block of the VPC.")
+    generate_shards(srcdir, store_file, 3)
+    app, read = build(make_app, srcdir, tfdoc_store_file="tfdoc.pickle")
+    store = app.env.tfdoc_store
+    assert store.changed == {"net/vpc"}
+    assert read == ["manual", "tfdoc/net/vpc/index"]
+
+
+def git(cwd, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_changed_since(rootdir, sphinx_test_tempdir, make_app):
+    srcdir = sphinx_test_tempdir / "tfdoc-changed-since"
+    (rootdir / "test-tfdoc").copytree(srcdir)
+    git(srcdir, "init", "-q")
+    git(srcdir, "add", "terraform")
+    git(srcdir, "commit", "-q", "-m", "base")
+    build(make_app, srcdir)
+
+    edit(srcdir, "net/vpc", "# The CIDR block.", "# The CIDR block of the VPC.")
+    app, read = build(make_app, srcdir, tfdoc_changed_since="HEAD")
+    store = app.env.tfdoc_store
+    vpc = os.path.join(srcdir, "terraform", "net", "vpc", "main.tf")
+    assert store.changed == {"net/vpc"}
+    assert store.patched == {vpc}
+    assert read == ["manual", "tfdoc/net/vpc/index"]
+
+    # once reverted, the file no longer differs from the ref, but the preview
+    # it was patched into still holds the change
+    edit(srcdir, "net/vpc", "# The CIDR block of the VPC.", "# The CIDR block.")
+    app, read = build(make_app, srcdir, tfdoc_changed_since="HEAD")
+    store = app.env.tfdoc_store
+    assert store.changed == {"net/vpc"}
+    assert store.patched == set()
+    assert read == ["manual", "tfdoc/net/vpc/index"]
+    assert "The CIDR block of the VPC." not in read_page(srcdir, "net/vpc/index.rst")
@@ -0,0 +1,103 @@
+import os
+from functools import partial
+
+import pytest
+
+from sphinx_tfdoc.hcl import HCLError, load_module
+from sphinx_tfdoc.store import _should_ignore
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "hcl")
+
+
+@pytest.fixture(scope="module")
+def module() -> dict:
+    should_ignore = partial(_should_ignore, ["tflint-ignore"])
+    return load_module(os.path.join(FIXTURES, "module"), should_ignore)
+
+
+def test_positions_and_comments(module):
+    name = module["variables"]["name"]
+    assert name["pos"] == {
+        "filename": os.path.join(FIXTURES, "module", "variables.tf"),
+        "line": 3,
+    }
+    # ignored lines neither contribute to nor end the block
+    assert name["doc"] == [" The name of the bucket."]
+    assert module["managed_resources"]["aws_s3_bucket.this"]["doc"] == [" The bucket."]
+    # uncommented objects carry an empty block, so that the file is not read
+    # again for their comments
+    assert module["variables"]["tags"]["doc"] == []
+    assert module["data_resources"]["data.aws_iam_policy_document.this"]["doc"] == []
+
+
+def test_templates(module):
+    name = module["variables"]["name"]
+    assert name["type"] == "string"
+    assert name["description"] == "Name of the ${var.prefix} bucket"
+    assert name["required"] is True
+
+
+def test_multiline_type(module):
+    tags = module["variables"]["tags"]
+    assert tags["type"] == (
+        "map(object({\n    owner = string\n    team  = optional(string)\n  }))"
+    )
+    assert tags["default"] == {"env": "dev"}
+    assert tags["required"] is False
+
+
+def test_heredocs(module):
+    # indented heredocs are stripped of their common indentation
+    assert module["variables"]["policy"]["default"] == (
+        '{\n  "Version": "2012-10-17"\n}\n'
+    )
+    assert module["outputs"]["arn"]["description"] == "The ARN of the bucket.\n"
+
+
+def test_required_providers(module):
+    assert module["required_providers"] == {
+        "aws": {"source": "hashicorp/aws", "version_constraints": ["~> 5.0"]},
+        "google": {"version_constraints": ["4.0"]},
+        "random": {"version_constraints": ["~> 3.0"]},
+    }
+    assert module["required_core"] == [">= 1.3"]
+
+
+def test_resources_and_calls(module):
+    bucket = module["managed_resources"]["aws_s3_bucket.this"]
+    assert bucket["provider"] == {"name": "aws", "alias": "east"}
+    policy = module["data_resources"]["data.aws_iam_policy_document.this"]
+    assert policy["mode"] == "data"
+    assert policy["provider"] == {"name": "aws"}
+    assert module["module_calls"]["vpc"]["source"] == "../vpc"
+    assert module["module_calls"]["registry"]["version"] == "5.0.0"
+    assert list(module["module_calls"]) == ["registry", "vpc"]
+
+
+def test_json():
+    data = load_module(os.path.join(FIXTURES, "json"))
+    region = data["variables"]["region"]
+    assert region["type"] == "string"
+    assert region["default"] == "eu-west-1"
+    assert region["doc"] == []
+    assert list(data["managed_resources"]) == ["aws_instance.web"]
+    assert data["required_providers"] == {
+        "aws": {"source": "hashicorp/aws", "version_constraints": [">= 4"]}
+    }
+
+
+def test_error_line():
+    with pytest.raises(HCLError) as info:
+        load_module(os.path.join(FIXTURES, "broken"))
+    filename = os.path.join(FIXTURES, "broken", "main.tf")
+    assert info.value.line == 4
+    assert str(info.value) == f"line 4: {filename}: missing value for default"
+
+
+def test_invalid_json(tmp_path):
+    (tmp_path / "main.tf.json").write_text('{"variable": {')
+    with pytest.raises(HCLError) as info:
+        load_module(str(tmp_path))
+    assert info.value.line == 1
+    assert str(tmp_path / "main.tf.json") in str(info.value)